@@ -0,0 +1,74 @@
+import os
+import re
+
+from grading_cache import normalize_answer
+
+# ---------------- Configuration ----------------
+CLUSTERING_ENABLED = os.getenv("ANSWER_CLUSTERING", "1") != "0"
+
+# Digits OCR reads in place of a letter inside a word ("0xygen", "ce1l", "5alt")
+CONFUSABLE_LETTERS = {"0": "o", "1": "li", "5": "s"}
+
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+
+
+def cluster_form(text) -> str:
+    """The answer with case, whitespace and all punctuation removed."""
+    return " ".join(re.sub(r"[^\w\s]", " ", normalize_answer(text)).split())
+
+
+def has_ocr_slip(form: str) -> bool:
+    """True if a word mixes letters with digits OCR confuses with letters."""
+    return any(LETTER_PATTERN.search(token) and any(c in CONFUSABLE_LETTERS for c in token)
+               for token in form.split())
+
+
+def ocr_variant(noisy: str, clean: str) -> bool:
+    """
+    True if noisy is clean with some letters inside words read as their
+    look-alike digits (see CONFUSABLE_LETTERS). Every other character, and
+    every number, must match exactly, so different words never match.
+    """
+    noisy_tokens, clean_tokens = noisy.split(), clean.split()
+    if noisy == clean or len(noisy_tokens) != len(clean_tokens):
+        return False
+    for a, b in zip(noisy_tokens, clean_tokens):
+        if a == b:
+            continue
+        if len(a) != len(b) or not LETTER_PATTERN.search(a):
+            return False
+        if any(ca != cb and cb not in CONFUSABLE_LETTERS.get(ca, "") for ca, cb in zip(a, b)):
+            return False
+    return True
+
+
+# ---------------- Clustering ----------------
+def cluster_answers(answers: list, weights: list = None) -> list:
+    """
+    Groups one question's answers into clusters of the same answer. Answers
+    are bucketed by cluster_form(); a bucket with an OCR slip (a digit read
+    in place of a letter inside a word) joins the one slip-free bucket it is
+    a variant of, and stays alone when there is none or several. weights
+    gives how many students wrote each answer. Returns a list of clusters,
+    each a list of answer indices with the representative (the most common
+    slip-free variant) first.
+    """
+    weights = weights or [1] * len(answers)
+    buckets = {}
+    for index, answer in enumerate(answers):
+        buckets.setdefault(cluster_form(answer), []).append(index)
+
+    clean_forms = [form for form in buckets if not has_ocr_slip(form)]
+    clusters = {form: list(indices) for form, indices in buckets.items() if form in clean_forms}
+    for form, indices in buckets.items():
+        if form in clusters:
+            continue
+        matches = [clean for clean in clean_forms if ocr_variant(form, clean)]
+        target = matches[0] if len(matches) == 1 else form
+        clusters.setdefault(target, []).extend(indices)
+
+    result = []
+    for target, indices in clusters.items():
+        indices.sort(key=lambda i: (cluster_form(answers[i]) != target, -weights[i]))
+        result.append(indices)
+    return result
@@ -0,0 +1,96 @@
+import json
+import os
+
+from prompt_builder import estimate_tokens, format_item
+
+# ---------------- Configuration ----------------
+# "student": one request grades all of a student's questions
+# "question": one request grades one question across many students
+# "off": one request per answer
+BATCH_MODE = os.getenv("GRADING_BATCH_MODE", "student")
+# Rough token budget for the items of one request (prompt and docs excluded)
+BATCH_TOKEN_BUDGET = int(os.getenv("GRADING_BATCH_TOKENS", "6000"))
+BATCH_MAX_ITEMS = int(os.getenv("GRADING_BATCH_MAX_ITEMS", "40"))
+
+# Schema-constrained output: one result object per item, matched by id
+RESULTS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "string"},
+            "awarded_marks": {"type": "number"},
+            "feedback": {"type": "string"},
+        },
+        "required": ["id", "awarded_marks", "feedback"],
+    },
+}
+
+
+# ---------------- Batching ----------------
+def batch_key(item: dict, mode: str = BATCH_MODE):
+    """Items sharing a key may go in one request."""
+    return item["student"] if mode == "student" else item["qno"]
+
+
+def make_batches(items: list, mode: str = BATCH_MODE, token_budget: int = BATCH_TOKEN_BUDGET,
+                 max_items: int = BATCH_MAX_ITEMS) -> list:
+    """
+    Groups items by student or question (see BATCH_MODE) and packs each
+    group greedily into batches of at most token_budget estimated tokens and
+    max_items items. An item larger than the budget gets a batch of its own.
+    """
+    if mode == "off":
+        return [[item] for item in items]
+
+    groups = {}
+    for item in items:
+        groups.setdefault(batch_key(item, mode), []).append(item)
+
+    batches = []
+    for group in groups.values():
+        batch, tokens = [], 0
+        for item in group:
+            cost = estimate_tokens(format_item(item))
+            if batch and (tokens + cost > token_budget or len(batch) >= max_items):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(item)
+            tokens += cost
+        if batch:
+            batches.append(batch)
+    return batches
+
+
+# ---------------- Requests ----------------
+def parse_batch_response(text: str, items: list) -> dict:
+    """
+    Maps the model's JSON array back to items. Returns {id: (awarded, feedback)}
+    with marks clamped to [0, max_marks]; items the model left out are absent.
+    """
+    by_id = {item["id"]: item for item in items}
+    results = {}
+    for entry in json.loads(text):
+        item = by_id.get(str(entry.get("id", "")))
+        if item is None or item["id"] in results:
+            continue
+        try:
+            awarded = float(entry.get("awarded_marks", 0))
+        except (TypeError, ValueError):
+            continue
+        awarded = min(max(awarded, 0), float(item["max_marks"]))
+        results[item["id"]] = (int(awarded) if awarded.is_integer() else awarded, entry.get("feedback", ""))
+    return results
+
+
+def grade_batch(model, contents: list, items: list) -> dict:
+    """
+    Grades items in one schema-constrained request, contents being
+    PromptBuilder.batch(items). Returns {id: (awarded, feedback)}. Raises on
+    API errors or malformed output, so the caller can fall back.
+    """
+    response = model.generate_content(
+        contents=contents,
+        generation_config={"response_mime_type": "application/json", "response_schema": RESULTS_SCHEMA},
+    )
+    return parse_batch_response(response.text, items)
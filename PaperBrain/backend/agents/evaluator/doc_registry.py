@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------------- Configuration ----------------
+REGISTRY_FILE = os.getenv("DOC_REGISTRY_FILE", "./cache/doc_registry.json")
+UPLOAD_WORKERS = int(os.getenv("DOC_UPLOAD_WORKERS", "4"))
+# Re-upload a doc when its remote copy expires within this many seconds
+EXPIRY_MARGIN_SECONDS = float(os.getenv("DOC_EXPIRY_MARGIN", "3600"))
+# Put the prompt and docs in an explicit Gemini context cache
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "0") == "1"
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+
+SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".webp"]
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_part(entry: dict) -> dict:
+    """A content part referencing an uploaded file, usable in generate_content."""
+    return {"file_data": {"file_uri": entry["uri"], "mime_type": entry["mime_type"]}}
+
+
+# ---------------- Registry ----------------
+class DocRegistry:
+    """
+    Remembers what has been uploaded to the Gemini Files API, keyed by content
+    hash, with the remote expiry, so unchanged docs are not uploaded again.
+    Also remembers explicit context caches by the hash of what they contain.
+    """
+
+    def __init__(self, path: str = REGISTRY_FILE, account: str = ""):
+        # Uploads belong to one API project, so entries are namespaced by a hash of the key
+        self.namespace = hashlib.sha256(account.encode("utf-8")).hexdigest()[:12]
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"files": {}, "contexts": {}}
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable doc registry ({e})")
+
+    def lookup(self, section: str, key: str, margin: float = EXPIRY_MARGIN_SECONDS):
+        """The entry for key, or None when missing or expiring within margin seconds."""
+        entry = self.data[section].get(f"{self.namespace}:{key}")
+        if entry and entry.get("expires", 0) - time.time() > margin:
+            return entry
+        return None
+
+    def record(self, section: str, key: str, entry: dict):
+        with self._lock:
+            self.data[section][f"{self.namespace}:{key}"] = entry
+            # Forget entries that have already expired remotely
+            now = time.time()
+            for name in list(self.data):
+                self.data[name] = {k: v for k, v in self.data[name].items() if v.get("expires", 0) > now}
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _expiry(remote) -> float:
+    expires = getattr(remote, "expiration_time", None) or getattr(remote, "expire_time", None)
+    return expires.timestamp() if expires else time.time()
+
+
+# ---------------- Uploads ----------------
+def upload_related_docs(folder_path, registry: DocRegistry = None):
+    """
+    Returns content parts for every supported doc in folder_path. Docs whose
+    content was uploaded before (and has not expired) are reused from the
+    registry; the rest are uploaded in parallel.
+    """
+    registry = registry or DocRegistry()
+    if not os.path.exists(folder_path):
+        return []
+
+    docs = []
+    for filename in sorted(os.listdir(folder_path)):
+        file_path = os.path.join(folder_path, filename)
+        if not os.path.isfile(file_path):
+            continue
+        if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+            print(f"Skipping unsupported file type: {filename}")
+            continue
+        docs.append((filename, file_path, file_sha256(file_path)))
+
+    parts = {}
+    to_upload = []
+    for filename, file_path, sha in docs:
+        entry = registry.lookup("files", sha)
+        if entry:
+            parts[sha] = file_part(entry)
+        else:
+            to_upload.append((filename, file_path, sha))
+    print(f"Context docs: {len(parts)} already uploaded, {len(to_upload)} to upload.")
+
+    def upload(doc):
+        import google.generativeai as genai
+
+        filename, file_path, sha = doc
+        print(f"Uploading file: {filename}")
+        try:
+            remote = genai.upload_file(path=file_path)
+        except Exception as e:
+            print(f"Failed to upload {filename}: {e}")
+            return
+        entry = {"filename": filename, "name": remote.name, "uri": remote.uri,
+                 "mime_type": remote.mime_type, "expires": _expiry(remote)}
+        registry.record("files", sha, entry)
+        parts[sha] = file_part(entry)
+
+    if to_upload:
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+            list(pool.map(upload, to_upload))
+
+    # Keep folder order so the request prefix is the same on every run
+    return [parts[sha] for _, _, sha in docs if sha in parts]
+
+
+# ---------------- Context Cache ----------------
+def get_context_cache(model_name: str, system_instruction: str, docs: list, registry: DocRegistry = None):
+    """
+    Returns a Gemini CachedContent holding the grading prompt and docs, reusing
+    one created earlier for the same content, or None when it cannot be used
+    (e.g. the content is below the API's minimum size for caching).
+    """
+    from google.generativeai import caching
+
+    registry = registry or DocRegistry()
+    key = hashlib.sha256(json.dumps([model_name, system_instruction, docs], sort_keys=True).encode("utf-8")).hexdigest()
+    # A context is only needed for the length of a run, so a short margin is enough
+    entry = registry.lookup("contexts", key, margin=60)
+    if entry:
+        try:
+            return caching.CachedContent.get(entry["name"])
+        except Exception as e:
+            print(f"Cached context {entry['name']} is gone ({e}), creating a new one.")
+
+    try:
+        cached = caching.CachedContent.create(
+            model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+            display_name="paperbrain-grading",
+            system_instruction=system_instruction,
+            contents=[{"role": "user", "parts": docs}] if docs else None,
+            ttl=CONTEXT_CACHE_TTL_SECONDS,
+        )
+    except Exception as e:
+        print(f"Context caching unavailable ({e}); sending the prompt and docs with every request.")
+        return None
+    registry.record("contexts", key, {"name": cached.name, "expires": _expiry(cached)})
+    print(f"Created context cache {cached.name}")
+    return cached
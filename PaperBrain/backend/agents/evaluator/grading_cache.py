@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------- Configuration ----------------
+DEFAULT_CACHE_DIR = os.getenv("GRADING_CACHE_DIR", "./cache")
+DEFAULT_MAX_ENTRIES = int(os.getenv("GRADING_CACHE_MAX_ENTRIES", "100000"))
+DEFAULT_MEMORY_ENTRIES = int(os.getenv("GRADING_CACHE_MEMORY_ENTRIES", "4096"))
+# Entries older than this are dropped (0 = keep until evicted by size)
+DEFAULT_TTL_DAYS = float(os.getenv("GRADING_CACHE_TTL_DAYS", "30"))
+# Counting rows is a table scan, so the size bound is checked every N writes
+EVICTION_CHECK_INTERVAL = 256
+
+
+def normalize_answer(text) -> str:
+    """Case, whitespace and surrounding punctuation do not change a grade."""
+    text = re.sub(r"\s+", " ", str(text or "").strip().lower())
+    return text.strip(" .,;:!?\"'")
+
+
+def doc_fingerprints(folder: str) -> list:
+    """sha256 of every related doc, sorted by name, so changed docs change the key."""
+    fingerprints = []
+    if not os.path.isdir(folder):
+        return fingerprints
+    for filename in sorted(os.listdir(folder)):
+        path = os.path.join(folder, filename)
+        if not os.path.isfile(path):
+            continue
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        fingerprints.append(f"{filename}:{h.hexdigest()}")
+    return fingerprints
+
+
+def grading_key(student_ans, ref_ans, max_marks, prompt_text: str, model_name: str, docs: list) -> str:
+    """Hashes everything that can change the grade the model would give."""
+    payload = json.dumps({
+        "answer": normalize_answer(student_ans),
+        "reference": normalize_answer(ref_ans),
+        "max_marks": max_marks,
+        "prompt": hashlib.sha256(prompt_text.encode("utf-8")).hexdigest(),
+        "model": model_name,
+        "docs": docs,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------- Cache ----------------
+class GradingCache:
+    """
+    Cache of model grades keyed by grading_key().
+
+    An in-memory LRU sits in front of an on-disk SQLite store. The disk store
+    is bounded to max_entries (the least recently used tenth is evicted on
+    overflow) and entries older than ttl_days are dropped, from both layers.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 memory_entries: int = DEFAULT_MEMORY_ENTRIES, ttl_days: float = DEFAULT_TTL_DAYS):
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "grading_cache.sqlite3")
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS grades ("
+            " key TEXT PRIMARY KEY, awarded_marks REAL NOT NULL, feedback TEXT NOT NULL,"
+            " metadata TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS grades_lru ON grades(last_used)")
+        self._db.commit()
+        self._evict()
+
+    def get(self, key: str):
+        """Returns the cached (awarded_marks, feedback, metadata) for key, or None."""
+        with self._lock:
+            if key in self._memory:
+                created, value = self._memory[key]
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT awarded_marks, feedback, metadata, created FROM grades WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[3]):
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE grades SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            awarded = int(row[0]) if float(row[0]).is_integer() else row[0]
+            value = (awarded, row[1], json.loads(row[2]))
+            self._remember(key, value, row[3])
+            self.hits += 1
+            return value
+
+    def put(self, key: str, awarded_marks, feedback: str, metadata: dict = None) -> None:
+        metadata = metadata or {}
+        now = time.time()
+        with self._lock:
+            self._remember(key, (awarded_marks, feedback, metadata), now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO grades (key, awarded_marks, feedback, metadata, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, float(awarded_marks), feedback, json.dumps(metadata), now, now),
+            )
+            self._db.commit()
+            self._writes += 1
+            if self._writes % EVICTION_CHECK_INTERVAL == 0:
+                self._evict()
+
+    def stats(self) -> dict:
+        """Hits and misses since the cache was opened."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _expired(self, created: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - created > self.ttl_seconds
+
+    def _remember(self, key: str, value, created: float) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM grades WHERE created < ?", (time.time() - self.ttl_seconds,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM grades").fetchone()
+        if count > self.max_entries:
+            drop = count - int(self.max_entries * 0.9)
+            self._db.execute(
+                "DELETE FROM grades WHERE key IN (SELECT key FROM grades ORDER BY last_used ASC LIMIT ?)",
+                (drop,),
+            )
+            print(f"[Grading cache] Evicted {drop} least recently used entries")
+        self._db.commit()
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------------- Configuration ----------------
+MAX_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_RPM", "60"))
+TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TPM", "250000"))
+MAX_RETRIES = int(os.getenv("GRADING_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("GRADING_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX_SECONDS = float(os.getenv("GRADING_BACKOFF_MAX", "30"))
+# Consecutive transient failures that open the circuit, and how long it stays open
+CIRCUIT_FAILURES = int(os.getenv("GRADING_CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("GRADING_CIRCUIT_RESET", "30"))
+# Send a duplicate request when the first has not answered after this long (0 = off)
+HEDGE_AFTER_SECONDS = float(os.getenv("GRADING_HEDGE_AFTER", "0"))
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class GradingError(Exception):
+    """A grading request that could not be completed (retries exhausted or circuit open)."""
+
+
+def is_transient(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)  # grpc StatusCode enums carry (number, name)
+    if isinstance(code, tuple):
+        code = code[0]
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+        if isinstance(error, (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted,
+                              api_exceptions.ServerError, api_exceptions.DeadlineExceeded)):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+# ---------------- Limiter ----------------
+class TokenBucket:
+    """
+    Refills at rate_per_minute; acquire(n) waits until n units are available.
+    Requests larger than the bucket are let through once it is full.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = max(1.0, rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures and rejects calls
+    for reset_seconds; then lets calls through again (half-open) and closes
+    on the first success.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURES, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_seconds else "half-open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+# ---------------- Executor ----------------
+class GradingExecutor:
+    """
+    Runs blocking model calls from asyncio with bounded concurrency, request
+    and token rate limits, retries with exponential backoff and full jitter
+    on transient errors, a circuit breaker, and optional hedged requests.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, requests_per_minute: float = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = TOKENS_PER_MINUTE, max_retries: int = MAX_RETRIES,
+                 hedge_after: float = HEDGE_AFTER_SECONDS):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker()
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        # Room for every in-flight request plus its hedge
+        self.pool = ThreadPoolExecutor(max_workers=2 * max_concurrency, thread_name_prefix="grading")
+        self.stats = {"calls": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "failed": 0}
+
+    def close(self):
+        """Releases the worker threads; straggling hedged calls finish in the background."""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _attempt(self, fn, args, tokens):
+        await self.requests.acquire()
+        await self.tokens.acquire(tokens)
+        self.stats["calls"] += 1
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    async def _hedged_attempt(self, fn, args, tokens):
+        if self.hedge_after <= 0:
+            return await self._attempt(fn, args, tokens)
+
+        primary = asyncio.ensure_future(self._attempt(fn, args, tokens))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        self.stats["hedged"] += 1
+        hedge = asyncio.ensure_future(self._attempt(fn, args, tokens))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()  # the thread finishes in the background; its result is dropped
+                    if task is hedge:
+                        self.stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def run(self, fn, *args, tokens: float = 1.0):
+        """
+        Calls fn(*args) in a worker thread under the limits above. Returns its
+        result; raises GradingError once transient failures exhaust the
+        retries (or the circuit is open), and re-raises other errors as is.
+        """
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                if self.breaker.state == "open":
+                    self.stats["failed"] += 1
+                    raise GradingError("Circuit open after repeated API failures")
+                try:
+                    result = await self._hedged_attempt(fn, args, tokens)
+                except Exception as e:
+                    if not is_transient(e):
+                        raise
+                    self.breaker.record_failure()
+                    if attempt == self.max_retries:
+                        self.stats["failed"] += 1
+                        raise GradingError(f"Giving up after {attempt + 1} attempts: {e}") from e
+                    self.stats["retries"] += 1
+                    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                    print(f"Transient API error ({e}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                self.breaker.record_success()
+                return result
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+# ---------------- Configuration ----------------
+# "gemini": the real API
+# "stub": local deterministic grader, no network (for load tests and benchmarks)
+# "record": the real API, saving every response to RECORDINGS_FILE
+# "replay": serves responses saved by "record", no network
+BACKEND = os.getenv("GRADING_BACKEND", "gemini")
+RECORDINGS_FILE = os.getenv("GRADING_RECORDINGS", "./cache/llm_recordings.jsonl")
+# Stub latency: "fixed:<ms>", "uniform:<min ms>,<max ms>" or "lognormal:<median ms>,<sigma>"
+STUB_LATENCY = os.getenv("STUB_LATENCY", "lognormal:800,0.5")
+# Fraction of stub requests that fail, and the status codes they fail with
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_ERROR_CODES = [int(code) for code in os.getenv("STUB_ERROR_CODES", "429,503").split(",")]
+STUB_SEED = int(os.getenv("STUB_SEED", "0"))
+
+OFFLINE_BACKENDS = {"stub", "replay"}
+STUB_MODEL_NAME = "local-stub"
+
+# Matches the items of both single-answer and batch prompts (prompt_builder.format_item)
+ITEM_PATTERN = re.compile(
+    r"(?:^Item (?P<id>\S+)\n)?Reference Answer:\n(?P<reference>.*?)\n+"
+    r"Maximum Marks: (?P<max_marks>[\d.]+)\n+Student Answer:\n(?P<answer>.*?)\s*(?=^Item \S+$|\Z)",
+    re.M | re.S,
+)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class BackendError(Exception):
+    """A failed backend request; code carries an HTTP-style status so retries treat it like an API error."""
+
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code
+
+
+class UsageMetadata:
+    def __init__(self, prompt_token_count: int = 0, candidates_token_count: int = 0):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class BackendResponse:
+    """The parts of a Gemini response the grader reads."""
+
+    def __init__(self, text: str, usage: dict = None):
+        self.text = text
+        self.usage_metadata = UsageMetadata(**(usage or {}))
+
+
+def text_parts(contents) -> list:
+    """The text of a request; uploaded file parts are left out."""
+    return [part for part in contents if isinstance(part, str)]
+
+
+def request_key(contents, generation_config=None) -> str:
+    """Identifies a request by its text and generation config, independent of where docs were uploaded."""
+    payload = json.dumps({"text": text_parts(contents), "config": generation_config}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def usage_of(response) -> dict:
+    usage = getattr(response, "usage_metadata", None)
+    return {"prompt_token_count": getattr(usage, "prompt_token_count", 0) or 0,
+            "candidates_token_count": getattr(usage, "candidates_token_count", 0) or 0}
+
+
+# ---------------- Backends ----------------
+class GradingBackend:
+    """
+    What the grader needs from a model: generate_content(contents,
+    generation_config=None) returning an object with .text (and
+    .usage_metadata). Errors with a transient .code are retried by
+    grading_executor.py.
+    """
+
+    model_name = ""
+
+    def generate_content(self, contents, generation_config=None):
+        raise NotImplementedError
+
+
+class GeminiBackend(GradingBackend):
+    """A google.generativeai GenerativeModel (plain or built from a context cache)."""
+
+    def __init__(self, model, model_name: str):
+        self.model = model
+        self.model_name = model_name
+
+    def generate_content(self, contents, generation_config=None):
+        if generation_config is None:
+            return self.model.generate_content(contents)
+        return self.model.generate_content(contents=contents, generation_config=generation_config)
+
+
+class StubBackend(GradingBackend):
+    """
+    Grades locally with a fixed rule: the share of the reference answer's
+    words found in the student answer, times the maximum marks, rounded down
+    to half marks. Waits a random latency (see STUB_LATENCY) and fails
+    STUB_ERROR_RATE of requests, both drawn from a seeded generator.
+    """
+
+    model_name = STUB_MODEL_NAME
+
+    def __init__(self, latency: str = STUB_LATENCY, error_rate: float = STUB_ERROR_RATE,
+                 error_codes: list = None, seed: int = STUB_SEED):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_codes = error_codes or STUB_ERROR_CODES
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def score(reference: str, answer: str, max_marks: float) -> float:
+        reference_words = set(WORD_PATTERN.findall(reference.lower()))
+        if not reference_words:
+            return 0
+        found = len(reference_words & set(WORD_PATTERN.findall(answer.lower())))
+        awarded = math.floor(2 * max_marks * found / len(reference_words)) / 2
+        return int(awarded) if awarded.is_integer() else awarded
+
+    def generate_content(self, contents, generation_config=None):
+        with self._lock:
+            delay = self.sample_latency(self._random)
+            failed = self._random.random() < self.error_rate
+            code = self._random.choice(self.error_codes)
+        time.sleep(delay)
+        if failed:
+            raise BackendError(f"Stub backend error {code}", code=code)
+
+        prompt = "\n".join(text_parts(contents))
+        results = []
+        for match in ITEM_PATTERN.finditer(prompt):
+            awarded = self.score(match["reference"], match["answer"], float(match["max_marks"]))
+            results.append({"id": match["id"], "awarded_marks": awarded,
+                            "feedback": f"Stub grade: {awarded}/{match['max_marks']} by word overlap."})
+        if generation_config is None:
+            # Single-answer prompt: one JSON object
+            text = json.dumps({k: v for k, v in results[0].items() if k != "id"}) if results else "{}"
+        else:
+            text = json.dumps(results)
+        return BackendResponse(text, {"prompt_token_count": len(prompt) // 4 + 1,
+                                      "candidates_token_count": len(text) // 4 + 1})
+
+
+class RecordingBackend(GradingBackend):
+    """Passes requests to another backend and appends each response to a JSONL file for replay."""
+
+    def __init__(self, backend: GradingBackend, path: str = RECORDINGS_FILE):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def generate_content(self, contents, generation_config=None):
+        response = self.backend.generate_content(contents, generation_config)
+        record = {"key": request_key(contents, generation_config), "model": self.model_name,
+                  "text": response.text, "usage": usage_of(response)}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return response
+
+
+class ReplayBackend(GradingBackend):
+    """
+    Serves responses saved by RecordingBackend, matched by request_key(). A
+    request that was never recorded raises a (non-transient) BackendError.
+    latency, when given, is simulated as for the stub.
+    """
+
+    def __init__(self, path: str = RECORDINGS_FILE, latency: str = None, seed: int = STUB_SEED):
+        self.responses = {}
+        self.model_name = ""
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record["key"]] = record
+                        self.model_name = record.get("model", self.model_name)
+        print(f"Replaying {len(self.responses)} recorded responses from {path}")
+        self.sample_latency = parse_latency(latency) if latency else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, generation_config=None):
+        if self.sample_latency:
+            with self._lock:
+                delay = self.sample_latency(self._random)
+            time.sleep(delay)
+        record = self.responses.get(request_key(contents, generation_config))
+        if record is None:
+            raise BackendError("No recorded response for this request")
+        return BackendResponse(record["text"], record.get("usage"))
+
+
+# ---------------- Factory ----------------
+def parse_latency(spec: str):
+    """Returns a function drawing one latency in seconds from a random.Random."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0] / 1000), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def create_backend(name: str = BACKEND, gemini_model=None, model_name: str = "", recordings: str = RECORDINGS_FILE):
+    """
+    Builds the backend called name. gemini_model is the GenerativeModel the
+    "gemini" and "record" backends send requests to.
+    """
+    if name == "stub":
+        return StubBackend()
+    if name == "replay":
+        return ReplayBackend(recordings)
+    if name not in ("gemini", "record"):
+        raise ValueError(f"Unknown grading backend: {name}")
+    backend = GeminiBackend(gemini_model, model_name)
+    return RecordingBackend(backend, recordings) if name == "record" else backend
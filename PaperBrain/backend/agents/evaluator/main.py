@@ -1,37 +1,47 @@
 import os
 import json
 import csv
-from dotenv import load_dotenv
-import google.generativeai as genai
-
-# ---------------- Environment Setup ----------------
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in .env file!")
-
-genai.configure(api_key=API_KEY)
+import asyncio
+import threading
+import time
+from answer_clustering import CLUSTERING_ENABLED, cluster_answers
+from batch_grader import BATCH_MODE, grade_batch, make_batches
+from doc_registry import CONTEXT_CACHE_ENABLED, DocRegistry, get_context_cache, upload_related_docs
+from grading_cache import GradingCache, doc_fingerprints, grading_key
+from grading_executor import GradingError, GradingExecutor
+from llm_backends import BACKEND, OFFLINE_BACKENDS, create_backend
+from prompt_builder import PromptBuilder
+from rule_grader import grade_with_rules
+from semantic_prescorer import PRESCORING_ENABLED, PreScorer, past_model_grades
+from usage_tracker import UsageTracker
+
+# ---------------- Configuration ----------------
 MODEL_NAME = "gemini-2.5-flash"
-model = genai.GenerativeModel(MODEL_NAME)
+GRADING_CACHE_ENABLED = os.getenv("GRADING_CACHE", "1") != "0"
 
 # ---------------- Paths ----------------
-INCOMING_FOLDER = "../text_recognition/Outputs"
-TEMP_DIR = "./temp"
-INPUTS_DIR = "./inputs"
-PROMPTS_DIR = "./prompts"
-RESULTS_DIR = "./results"
+# Relative to this folder, so the grader works from any working directory
+EVALUATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+INCOMING_FOLDER = os.path.join(EVALUATOR_DIR, "..", "text_recognition", "Outputs")
+TEMP_DIR = os.path.join(EVALUATOR_DIR, "temp")
+INPUTS_DIR = os.path.join(EVALUATOR_DIR, "inputs")
+PROMPTS_DIR = os.path.join(EVALUATOR_DIR, "prompts")
+RESULTS_DIR = os.path.join(EVALUATOR_DIR, "results")
+CACHE_DIR = os.path.join(EVALUATOR_DIR, "cache")
 
 STUDENT_FILE = os.path.join(INPUTS_DIR, "student_answers.json")
 REFERENCE_FILE = os.path.join(INPUTS_DIR, "reference_answers.json")
 PROMPT_FILE = os.path.join(PROMPTS_DIR, "prompt.txt")
+# Optional grading rubric shared by every question, sent right after the prompt
+RUBRIC_FILE = os.path.join(PROMPTS_DIR, "rubric.txt")
 DOCS_FOLDER = os.path.join(INPUTS_DIR, "related_docs")
 CSV_FILE = os.path.join(RESULTS_DIR, "evaluation_results.csv")
 JSON_FILE = os.path.join(RESULTS_DIR, "evaluation_results.json")
+LLM_CALLS_FILE = os.path.join(RESULTS_DIR, "llm_calls.jsonl")
+# Usage summaries of this many past runs are kept in the results
+RUN_HISTORY = int(os.getenv("GRADING_RUN_HISTORY", "100"))
 CURRENT_STUDENT_FILE = os.path.join(TEMP_DIR, "current_student.json")
-
-# Ensure directories exist
-for path in [INCOMING_FOLDER, TEMP_DIR, INPUTS_DIR, PROMPTS_DIR, DOCS_FOLDER, RESULTS_DIR]:
-    os.makedirs(path, exist_ok=True)
+RECORDINGS_FILE = os.getenv("GRADING_RECORDINGS", os.path.join(CACHE_DIR, "llm_recordings.jsonl"))
 
 # ---------------- Helper Functions ----------------
 def load_json(path):
@@ -44,195 +54,499 @@ def save_json(path, data):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
 
-# ---------------- Initial Setup ----------------
-reference_answers = load_json(REFERENCE_FILE)
-
-with open(PROMPT_FILE, "r", encoding="utf-8") as f:
-    BASE_PROMPT = f.read()
-
-# ---------------- Upload Related Docs ----------------
-def upload_related_docs(folder_path):
-    uploaded_files = []
-    if not os.path.exists(folder_path):
-        return uploaded_files
-
-    SUPPORTED_EXTENSIONS = [".pdf", ".docx", ".txt", ".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".webp"]
-    print("Starting document and image upload for context...")
-
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        if not os.path.isfile(file_path):
-            continue
-        ext = os.path.splitext(filename)[1].lower()
-        if ext not in SUPPORTED_EXTENSIONS:
-            print(f"Skipping unsupported file type: {filename}")
-            continue
-        print(f"Uploading file: {filename}")
+
+def parse_gemini_response(text):
+    """Returns (awarded_marks, feedback); raises ValueError when no JSON object can be read."""
+    text = text.strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError(f"Invalid response format. Raw text: {text[:100]}...")
+    result = json.loads(text[start:end + 1])
+    return result.get("awarded_marks", 0), result.get("feedback", "")
+
+
+# ---------------- Grader ----------------
+class Grader:
+    """
+    Grades student submissions against the reference answers.
+
+    Constructing a Grader has no side effects. setup() (run on first use)
+    configures Gemini; load_inputs() (run for every batch of submissions)
+    reads the prompt and reference answers and uploads changed related docs.
+    One Grader can be kept for the life of a process and reused across runs.
+    backend picks where requests go (see llm_backends.py); the offline
+    backends need no API key and send no related docs.
+    """
+
+    def __init__(self, api_key=None, model_name=MODEL_NAME, incoming_folder=INCOMING_FOLDER, backend=BACKEND):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.incoming_folder = incoming_folder
+        self.backend = backend
+
+        self.model = None
+        self.base_prompt = ""
+        self.reference_answers = {}
+        self.related_docs = []
+        self.doc_fingerprints = []
+        self.past_grades = {}
+        # Lays out requests with the static prompt and docs first (prompt_builder.py)
+        self.prompts = PromptBuilder("")
+
+        self._ready = False
+        self._genai = None
+        self._base_model = None
+        self._doc_registry = None
+        self._grading_cache = None
+        self._lock = threading.Lock()
+
+    # ---------------- Setup ----------------
+    def setup(self):
+        """Configures the grading backend and creates the working folders (once)."""
+        with self._lock:
+            if self._ready:
+                return
+            for path in [self.incoming_folder, TEMP_DIR, INPUTS_DIR, PROMPTS_DIR, DOCS_FOLDER, RESULTS_DIR]:
+                os.makedirs(path, exist_ok=True)
+
+            if self.backend in OFFLINE_BACKENDS:
+                self._base_model = create_backend(self.backend, recordings=RECORDINGS_FILE)
+                self.model_name = self._base_model.model_name or self.model_name
+                print(f"Grading with the offline '{self.backend}' backend ({self.model_name})")
+            else:
+                from dotenv import load_dotenv
+                import google.generativeai as genai
+
+                load_dotenv()
+                self.api_key = self.api_key or os.getenv("GEMINI_API_KEY")
+                if not self.api_key:
+                    raise ValueError("GEMINI_API_KEY not found in .env file!")
+                genai.configure(api_key=self.api_key)
+
+                self._base_model = create_backend(self.backend, genai.GenerativeModel(self.model_name),
+                                                  self.model_name, RECORDINGS_FILE)
+                self._doc_registry = DocRegistry(os.path.join(CACHE_DIR, "doc_registry.json"), account=self.api_key)
+                self._genai = genai
+            self._ready = True
+
+    def load_inputs(self):
+        """Reads the prompt and reference answers and brings the related docs up to date."""
+        self.setup()
+        self.reference_answers = load_json(REFERENCE_FILE)
+        # Past model grades calibrate the pre-scorer's thresholds (semantic_prescorer.py)
+        self.past_grades = past_model_grades(load_json(JSON_FILE))
+        with open(PROMPT_FILE, "r", encoding="utf-8") as f:
+            self.base_prompt = f.read()
+        rubric = ""
+        if os.path.isfile(RUBRIC_FILE):
+            with open(RUBRIC_FILE, "r", encoding="utf-8") as f:
+                rubric = f.read()
+
+        # Unchanged docs are reused from earlier uploads (see doc_registry.py)
+        self.related_docs = upload_related_docs(DOCS_FOLDER, self._doc_registry) if self._genai else []
+        if not self.related_docs:
+            print("No context documents found. Grading will rely only on prompt and answers.\n")
+        self.doc_fingerprints = doc_fingerprints(DOCS_FOLDER)
+
+        self.model = self._base_model
+        self.prompts = PromptBuilder(self.base_prompt, rubric, self.related_docs)
+        if CONTEXT_CACHE_ENABLED and self._genai:
+            # With an explicit context cache the prompt and docs live on the server,
+            # and each request only carries its own item(s)
+            context_cache = get_context_cache(self.model_name, self.prompts.instructions, self.related_docs,
+                                              self._doc_registry)
+            if context_cache is not None:
+                self.model = create_backend(self.backend, self._genai.GenerativeModel.from_cached_content(context_cache),
+                                            self.model_name, RECORDINGS_FILE)
+                self.prompts.cached = True
+        print(f"Shared request prefix: {self.prompts.describe()}")
+
+    def get_grading_cache(self):
+        """The persistent grade cache (grading_cache.py), opened on first use; None when disabled."""
+        if self._grading_cache is None and GRADING_CACHE_ENABLED:
+            self._grading_cache = GradingCache(CACHE_DIR)
+        return self._grading_cache
+
+    # ---------------- Gemini Evaluation ----------------
+    def build_gemini_contents(self, student_ans, ref_ans, max_marks):
+        return self.prompts.single({"answer": student_ans, "reference": ref_ans, "max_marks": max_marks})
+
+    async def evaluate_with_gemini_async(self, executor, student_ans, ref_ans, max_marks, model=None):
+        """
+        Grades one answer through the executor. Returns (awarded, feedback, graded_by)
+        with graded_by "llm", or "error" for a non-transient API error or an
+        unreadable response. Transient API errors are retried there and surface
+        as GradingError once retries run out. model overrides self.model
+        (e.g. a UsageTracker-metered one).
+        """
+        model = model or self.model
+        contents = self.build_gemini_contents(student_ans, ref_ans, max_marks)
         try:
-            uploaded_file = genai.upload_file(path=file_path)
-            uploaded_files.append(uploaded_file)
+            response = await executor.run(model.generate_content, contents, tokens=self.prompts.count_tokens(contents))
+            text = response.text
+        except GradingError:
+            raise
         except Exception as e:
-            print(f"Failed to upload {filename}: {e}")
-
-    print(f"Uploaded {len(uploaded_files)} context files.")
-    return uploaded_files
-
-related_docs = upload_related_docs(DOCS_FOLDER)
-if not related_docs:
-    print("No context documents found. Grading will rely only on prompt and answers.\n")
-
-# ---------------- Gemini Evaluation ----------------
-def evaluate_with_gemini(student_ans, ref_ans, max_marks):
-    full_prompt = f"""{BASE_PROMPT}
-
-Reference Answer:
-{ref_ans}
-
-Student Answer:
-{student_ans}
-
-Maximum Marks: {max_marks}
-
-Use any additional context from the uploaded related documents to ensure more accurate grading.
-"""
-
-    contents = [full_prompt]
-    if related_docs:
-        contents.extend(related_docs)
-
-    try:
-        response = model.generate_content(contents=contents)
-        text = response.text.strip()
-
-        start, end = text.find("{"), text.rfind("}")
-        if start != -1 and end != -1:
-            json_str = text[start:end + 1]
-            result = json.loads(json_str)
-            return result.get("awarded_marks", 0), result.get("feedback", "")
-        else:
-            return 0, f"Invalid response format. Raw text: {text[:100]}..."
-    except Exception as e:
-        return 0, f"API Error: {str(e)}"
-
-# ---------------- Process One File ----------------
-def process_student_file(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        student_entry = json.load(f)
-
-    student_info = student_entry.get("student_info", {})
-    student_answers = student_entry.get("answers", {})
-    student_name = student_info.get("name", "")
-    roll_no = student_info.get("roll_no", "")
-
-    print(f"Evaluating student: {student_name} ({roll_no})")
+            return 0, f"API Error: {str(e)}", "error"
+        try:
+            return (*parse_gemini_response(text), "llm")
+        except ValueError as e:
+            return 0, str(e), "error"
+
+    def evaluate_with_gemini(self, student_ans, ref_ans, max_marks):
+        if self.model is None:
+            self.load_inputs()
+        executor = GradingExecutor(max_concurrency=1)
+        try:
+            return asyncio.run(self.evaluate_with_gemini_async(executor, student_ans, ref_ans, max_marks))[:2]
+        finally:
+            executor.close()
+
+    # ---------------- Grading ----------------
+    async def grade_with_gemini(self, items, tracker=None):
+        """
+        Grades items in batched Gemini requests (see batch_grader.py), running the
+        requests concurrently through a GradingExecutor (grading_executor.py).
+        Items a batch fails to return are graded one by one. Items whose requests
+        keep failing transiently are left out of the result. Every request is
+        recorded in tracker (usage_tracker.py).
+        """
+        executor = GradingExecutor()
+        tracker = tracker or UsageTracker(self.model_name)
+        grades = {}
+
+        async def grade_single(item):
+            tokens = self.prompts.count_tokens(self.prompts.single(item))
+            print(f"Processing Question {item['qno']} ({item['student']}), ~{tokens} prompt tokens...")
+            try:
+                grades[item["id"]] = await self.evaluate_with_gemini_async(
+                    executor, item["answer"], item["reference"], item["max_marks"],
+                    model=tracker.meter(self.model, "single", [item], tokens))
+            except GradingError as e:
+                print(f"Could not grade {item['qno']} ({item['student']}): {e}")
+
+        async def grade_group(batch):
+            results = {}
+            if len(batch) > 1:
+                contents = self.prompts.batch(batch)
+                tokens = self.prompts.count_tokens(contents)
+                print(f"Grading {len(batch)} answers in one request ({BATCH_MODE} batch), ~{tokens} prompt tokens...")
+                try:
+                    results = await executor.run(grade_batch, tracker.meter(self.model, "batch", batch, tokens),
+                                                 contents, batch, tokens=tokens)
+                except GradingError as e:
+                    print(f"Could not grade batch ({e})")
+                    return
+                except Exception as e:
+                    print(f"Batch request failed ({e}), grading its answers one by one.")
+            for item in batch:
+                if item["id"] in results:
+                    grades[item["id"]] = (*results[item["id"]], "llm")
+            await asyncio.gather(*(grade_single(item) for item in batch if item["id"] not in results))
 
-    total_awarded = 0
-    total_possible = 0
-    answers = {}
+        try:
+            await asyncio.gather(*(grade_group(batch) for batch in make_batches(items)))
+        finally:
+            executor.close()
+        print(f"Gemini requests: {executor.stats}")
+        return grades
+
+    @staticmethod
+    def cluster_groups(groups):
+        """
+        Clusters the distinct answers (grade-cache keys) of each question with
+        answer_clustering.py. Returns lists of keys, the representative's first.
+        """
+        by_question = {}
+        for key, group in groups.items():
+            by_question.setdefault(group[0]["qno"], []).append(key)
+
+        clusters = []
+        for keys in by_question.values():
+            if not CLUSTERING_ENABLED:
+                clusters.extend([key] for key in keys)
+                continue
+            answers = [groups[key][0]["answer"] for key in keys]
+            for indices in cluster_answers(answers, [len(groups[key]) for key in keys]):
+                clusters.append([keys[i] for i in indices])
+        return clusters
+
+    def grade_items(self, items, stats=None, tracker=None):
+        """
+        Grades (student, question) items: rule-gradable answers first, then
+        clear-cut short answers by similarity to the reference, then the grade
+        cache, then Gemini for what is left. Near-identical answers to the
+        same question are clustered and only one per cluster is sent. Returns
+        {item id: (awarded, feedback, graded_by[, extra fields])}; items that
+        could not be graded are missing. Counts, and the request usage recorded
+        in tracker (usage_tracker.py), are added to stats when given.
+        """
+        stats = stats if stats is not None else {}
+        tracker = tracker or UsageTracker(self.model_name)
+        cache = self.get_grading_cache()
+        prescorer = PreScorer(self.reference_answers, self.past_grades, items) if PRESCORING_ENABLED else None
+        grades = {}
+        groups = {}  # cache key -> items sharing it; the first one is sent to the model
+        # This run's lookups only; cache.stats() counts over the cache's whole lifetime
+        cache_lookups = {"hits": 0, "misses": 0}
+        for item in items:
+            # MCQ / numeric answers are graded by rules; only the rest need the model
+            rule_result = grade_with_rules(item["answer"], item["ref_info"])
+            if rule_result is not None:
+                grades[item["id"]] = (*rule_result, "rules")
+                continue
+            # Clearly right or clearly wrong short answers do not need the model either
+            prescore = prescorer.grade(item) if prescorer else None
+            if prescore is not None:
+                grades[item["id"]] = (*prescore, "prescore")
+                continue
+
+            key = grading_key(item["answer"], item["reference"], item["max_marks"], self.prompts.instructions,
+                              self.model_name, self.doc_fingerprints)
+            if key in groups:
+                groups[key].append(item)
+                stats["duplicates"] = stats.get("duplicates", 0) + 1
+                continue
+            cached = cache.get(key) if cache else None
+            if cache:
+                cache_lookups["hits" if cached is not None else "misses"] += 1
+            if cached is not None:
+                grades[item["id"]] = (cached[0], cached[1], "cache")
+                continue
+            groups[key] = [item]
+
+        # Near-identical answers to a question form a cluster; only its representative is sent
+        clusters = self.cluster_groups(groups)
+        llm_grades = asyncio.run(self.grade_with_gemini([groups[keys[0]][0] for keys in clusters], tracker)) if clusters else {}
+        for n, keys in enumerate(clusters, 1):
+            representative = groups[keys[0]][0]
+            result = llm_grades.get(representative["id"])
+            if result is None:
+                continue
+            if cache and result[2] == "llm":
+                cache.put(keys[0], result[0], result[1], {"model": self.model_name, "qno": representative["qno"],
+                                                          "graded_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+            members = [member for key in keys for member in groups[key]]
+            link = None
+            if len(members) > 1:
+                # Members stay linked to the graded representative for auditing
+                link = {"cluster": {"id": f"{representative['qno']}-{n}", "size": len(members),
+                                    "representative": representative["student"],
+                                    "representative_answer": representative["answer"]}}
+                stats["clustered"] = stats.get("clustered", 0) + len(members) - 1
+            for member in members:
+                graded_by = result[2] if member is representative or result[2] != "llm" else "cluster"
+                grades[member["id"]] = (result[0], result[1], graded_by, link) if link else (result[0], result[1], graded_by)
+
+        for graded_by in ("rules", "prescore", "cache", "llm", "cluster", "error"):
+            stats[graded_by] = stats.get(graded_by, 0) + sum(1 for g in grades.values() if g[2] == graded_by)
+        stats["ungraded"] = stats.get("ungraded", 0) + len(items) - len(grades)
+        if prescorer and prescorer.thresholds:
+            stats["prescore_thresholds"] = prescorer.thresholds
+        if cache:
+            cache_stats = stats.setdefault("cache_stats", {"hits": 0, "misses": 0})
+            cache_stats["hits"] = cache_stats.get("hits", 0) + cache_lookups["hits"]
+            cache_stats["misses"] = cache_stats.get("misses", 0) + cache_lookups["misses"]
+            lookups = cache_stats["hits"] + cache_stats["misses"]
+            cache_stats["hit_rate"] = round(cache_stats["hits"] / lookups, 4) if lookups else 0.0
+            print(f"Grading cache: {cache_stats} this run, {cache.stats()} since start")
+        print(f"Graded {len(grades)}/{len(items)} answers: {stats.get('rules', 0)} by rules, "
+              f"{stats.get('prescore', 0)} by similarity, {stats.get('cache', 0)} from cache, {stats.get('llm', 0)} by {self.model_name}, "
+              f"{stats.get('cluster', 0)} via their cluster")
+        stats["usage"] = tracker.summary(items, grades)
+        run_usage = stats["usage"]["run"]
+        print(f"Model usage: {run_usage['requests']} requests ({run_usage['retries']} retries), "
+              f"{run_usage['prompt_tokens']} prompt / {run_usage['response_tokens']} response tokens, "
+              f"~${run_usage['cost_usd']:.4f}, p95 latency {run_usage['latency_ms']['p95']} ms")
+        return grades
+
+    def collect_items(self, student_key, student_answers):
+        """Turns one student's answers into grading items (questions with a reference answer)."""
+        items = []
+        for qno, student_ans in student_answers.items():
+            ref_info = self.reference_answers.get(str(qno))
+            if not ref_info:
+                continue
+            items.append({
+                "id": f"{student_key}:{qno}",
+                "student": student_key,
+                "qno": qno,
+                "answer": student_ans,
+                "reference": ref_info["answer"],
+                "max_marks": ref_info["marks"],
+                "ref_info": ref_info,
+            })
+        return items
+
+    def build_student_result(self, student_key, student_entry, grades):
+        student_info = student_entry.get("student_info", {})
+        total_awarded = 0
+        total_possible = 0
+        answers = {}
+
+        for qno, student_ans in student_entry.get("answers", {}).items():
+            ref_info = self.reference_answers.get(str(qno))
+            if not ref_info:
+                answers[qno] = {
+                    "answer": student_ans,
+                    "awarded_marks": 0,
+                    "max_marks": 0,
+                    "feedback": "No reference answer found"
+                }
+                continue
+
+            awarded, feedback, graded_by, *extra = grades[f"{student_key}:{qno}"]
+            max_marks = ref_info["marks"]
+            total_awarded += awarded
+            total_possible += max_marks
 
-    for qno, student_ans in student_answers.items():
-        ref_info = reference_answers.get(str(qno))
-        if not ref_info:
             answers[qno] = {
                 "answer": student_ans,
-                "awarded_marks": 0,
-                "max_marks": 0,
-                "feedback": "No reference answer found"
+                "awarded_marks": awarded,
+                "max_marks": max_marks,
+                "feedback": feedback,
+                "graded_by": graded_by
             }
-            continue
-
-        ref_ans = ref_info["answer"]
-        max_marks = ref_info["marks"]
-
-        print(f"Processing Question {qno}...")
-        awarded, feedback = evaluate_with_gemini(student_ans, ref_ans, max_marks)
-
-        total_awarded += awarded
-        total_possible += max_marks
-
-        answers[qno] = {
-            "answer": student_ans,
-            "awarded_marks": awarded,
-            "max_marks": max_marks,
-            "feedback": feedback
+            for fields in extra:
+                answers[qno].update(fields)
+
+        return {
+            "student_info": student_info,
+            "total_awarded_marks": total_awarded,
+            "total_possible_marks": total_possible,
+            "answers": answers
         }
 
-    updated_data = {
-        "student_info": student_info,
-        "total_awarded_marks": total_awarded,
-        "total_possible_marks": total_possible,
-        "answers": answers
-    }
+    def grade_submissions(self, submissions, stats=None):
+        """
+        Grades in-memory submissions ({"student_info", "answers"} dicts, with an
+        optional "id") together, so batches can span students
+        (GRADING_BATCH_MODE=question). Returns {"students": results in order,
+        "ungraded": ids of submissions to retry, "stats": counts and usage,
+        "calls": one record per model request}; nothing is written to disk.
+        """
+        self.load_inputs()
+        stats = stats if stats is not None else {}
+        keyed = [(str(entry.get("id", f"submission-{n}")), entry) for n, entry in enumerate(submissions, 1)]
+        items = []
+        for student_key, student_entry in keyed:
+            student_info = student_entry.get("student_info", {})
+            print(f"Evaluating student: {student_info.get('name', '')} ({student_info.get('roll_no', '')})")
+            items.extend(self.collect_items(student_key, student_entry.get("answers", {})))
+
+        tracker = UsageTracker(self.model_name)
+        grades = self.grade_items(items, stats, tracker)
+
+        students, ungraded = [], []
+        for student_key, student_entry in keyed:
+            missing = [item["qno"] for item in items if item["student"] == student_key and item["id"] not in grades]
+            if missing:
+                # Reported for a retry rather than recorded as zeros
+                print(f"Skipping {student_key}: {', '.join(missing)} could not be graded.")
+                ungraded.append(student_key)
+                continue
+            result = self.build_student_result(student_key, student_entry, grades)
+            result["id"] = student_key
+            result["usage"] = stats["usage"]["per_student"].get(student_key, {})
+            students.append(result)
+        return {"students": students, "ungraded": ungraded, "stats": stats, "calls": tracker.calls}
+
+    # ---------------- Process Files ----------------
+    def append_results(self, all_results, stats=None, calls=None):
+        """
+        Appends graded students to the cumulative JSON and CSV results, and the
+        run's model requests (see usage_tracker.py) to llm_calls.jsonl.
+        """
+        student_data = load_json(STUDENT_FILE)
+        master_results = load_json(JSON_FILE)
+
+        student_data.setdefault("students", []).extend(all_results)
+        master_results.setdefault("students", []).extend(all_results)
+        if stats is not None:
+            # How the latest run's answers were graded, including the cache hit rate
+            master_results["last_run"] = stats
+            if "usage" in stats:
+                runs = master_results.setdefault("runs", [])
+                runs.append({"finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "students": len(all_results),
+                             "usage": stats["usage"]["run"]})
+                del runs[:-RUN_HISTORY]
+        save_json(STUDENT_FILE, student_data)
+        save_json(JSON_FILE, master_results)
+        if calls:
+            with open(LLM_CALLS_FILE, "a", encoding="utf-8") as f:
+                for call in calls:
+                    f.write(json.dumps(call, ensure_ascii=False) + "\n")
+
+        csv_exists = os.path.exists(CSV_FILE)
+        with open(CSV_FILE, "a", newline='', encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if not csv_exists or os.path.getsize(CSV_FILE) == 0:
+                writer.writerow(["Student Name", "Roll No", "Question No", "Student Answer",
+                                 "Reference Answer", "Max Marks", "Awarded Marks", "Feedback"])
+            for current_data in all_results:
+                for qno, details in current_data["answers"].items():
+                    writer.writerow([
+                        current_data["student_info"].get("name", ""),
+                        current_data["student_info"].get("roll_no", ""),
+                        qno,
+                        details["answer"],
+                        self.reference_answers.get(qno, {}).get("answer", "N/A"),
+                        details["max_marks"],
+                        details["awarded_marks"],
+                        details["feedback"]
+                    ])
+
+    def process_all_students(self):
+        """
+        Grades every submission waiting in the text recognition Outputs folder,
+        saves the results, and removes the graded submissions (ungraded ones
+        stay for the next run). Returns grade_submissions()'s result.
+        """
+        self.setup()
+        files = sorted(
+            [os.path.join(self.incoming_folder, f) for f in os.listdir(self.incoming_folder) if f.endswith(".json")],
+            key=os.path.getctime
+        )
+
+        if not files:
+            print("No new student submissions found.")
+            return {"students": [], "ungraded": [], "stats": {}, "calls": []}
+
+        print(f"Found {len(files)} submissions to process.\n")
+
+        submissions = []
+        for file_path in files:
+            with open(file_path, "r", encoding="utf-8") as f:
+                submissions.append({**json.load(f), "id": os.path.basename(file_path)})
+
+        run = self.grade_submissions(submissions)
+        for current_data in run["students"]:
+            file_path = os.path.join(self.incoming_folder, current_data["id"])
+            os.remove(file_path)
+            print(f"Removed processed file: {file_path}")
+        return self.save_run(run)
+
+    def save_run(self, run):
+        """
+        Saves a grade_submissions() result: the current student record, the
+        cumulative JSON/CSV results and the run's model requests. Returns run.
+        """
+        for current_data in run["students"]:
+            save_json(CURRENT_STUDENT_FILE, current_data)
+        self.append_results(run["students"], run["stats"], run["calls"])
+
+        for current_data in run["students"]:
+            print(f"\nEvaluation complete for {current_data['student_info'].get('name', 'Unknown Student')}")
+            print(f"Final Score: {current_data['total_awarded_marks']}/{current_data['total_possible_marks']}")
+        if run["ungraded"]:
+            print(f"Left for the next run: {', '.join(run['ungraded'])}")
+        print(f"Current student record saved at: {CURRENT_STUDENT_FILE}")
+        print("Updated results saved in JSON and CSV.")
+        return run
 
-    save_json(CURRENT_STUDENT_FILE, updated_data)
 
-    os.remove(file_path)
-    print(f"Removed processed file: {file_path}")
-
-    return updated_data
-
-# ---------------- Main Processing ----------------
 def process_all_students():
-    files = sorted(
-        [os.path.join(INCOMING_FOLDER, f) for f in os.listdir(INCOMING_FOLDER) if f.endswith(".json")],
-        key=os.path.getctime
-    )
-
-    if not files:
-        print("No new student submissions found.")
-        return
-
-    print(f"Found {len(files)} submissions to process.\n")
-
-    # Safe load of current_student.json
-    if os.path.exists(CURRENT_STUDENT_FILE):
-        try:
-            if os.path.getsize(CURRENT_STUDENT_FILE) > 0:
-                with open(CURRENT_STUDENT_FILE, "r", encoding="utf-8") as f:
-                    content = f.read().strip()
-                    current_data = json.loads(content) if content else {}
-            else:
-                current_data = {}
-        except Exception as e:
-            print(f"Warning: Failed to load current_student.json ({e}), starting fresh.")
-            current_data = {}
-    else:
-        current_data = {}
-
-    for file_path in files:
-        current_data = process_student_file(file_path)
-
-    # Save to cumulative result files
-    student_data = load_json(STUDENT_FILE)
-    master_results = load_json(JSON_FILE)
-
-    student_data.setdefault("students", []).append(current_data)
-    master_results.setdefault("students", []).append(current_data)
-    save_json(STUDENT_FILE, student_data)
-    save_json(JSON_FILE, master_results)
-
-    csv_exists = os.path.exists(CSV_FILE)
-    with open(CSV_FILE, "a", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if not csv_exists or os.path.getsize(CSV_FILE) == 0:
-            writer.writerow(["Student Name", "Roll No", "Question No", "Student Answer",
-                             "Reference Answer", "Max Marks", "Awarded Marks", "Feedback"])
-        for qno, details in current_data["answers"].items():
-            writer.writerow([
-                current_data["student_info"].get("name", ""),
-                current_data["student_info"].get("roll_no", ""),
-                qno,
-                details["answer"],
-                reference_answers.get(qno, {}).get("answer", "N/A"),
-                details["max_marks"],
-                details["awarded_marks"],
-                details["feedback"]
-            ])
-
-    print(f"\nEvaluation complete for {current_data['student_info'].get('name', 'Unknown Student')}")
-    print(f"Final Score: {current_data['total_awarded_marks']}/{current_data['total_possible_marks']}")
-    print(f"Current student record saved at: {CURRENT_STUDENT_FILE}")
-    print("Updated results saved in JSON and CSV.")
+    return Grader().process_all_students()
 
 # ---------------- Run Script ----------------
 if __name__ == "__main__":
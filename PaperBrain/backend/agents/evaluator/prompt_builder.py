@@ -0,0 +1,77 @@
+import os
+
+# ---------------- Configuration ----------------
+# Student answers longer than this (estimated tokens) are trimmed in the prompt
+ANSWER_TOKEN_BUDGET = int(os.getenv("PROMPT_ANSWER_MAX_TOKENS", "800"))
+CHARS_PER_TOKEN = 4
+
+DOCS_NOTE = "Use any additional context from the uploaded related documents to ensure more accurate grading."
+
+BATCH_INSTRUCTIONS = """
+You will now grade several items at once. Grade every item independently, using
+only its own reference answer, student answer and maximum marks.
+Instead of a single JSON object, return a JSON array with exactly one object per
+item: {"id": "<item id>", "awarded_marks": <number>, "feedback": "<short_feedback>"}.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim_answer(text, budget: int = ANSWER_TOKEN_BUDGET) -> str:
+    """Keeps the start and end of an answer longer than budget tokens, marking the cut."""
+    text = str(text)
+    limit = budget * CHARS_PER_TOKEN
+    if budget <= 0 or len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    return f"{text[:head]}\n[... {len(text) - limit} characters trimmed ...]\n{text[-tail:]}"
+
+
+def format_item(item: dict, with_id: bool = True) -> str:
+    """An item's per-question part (reference, marks) followed by the student's answer."""
+    header = f"Item {item['id']}\n" if with_id else ""
+    return (f"{header}Reference Answer:\n{item['reference']}\n"
+            f"Maximum Marks: {item['max_marks']}\n"
+            f"Student Answer:\n{trim_answer(item['answer'])}\n")
+
+
+# ---------------- Builder ----------------
+class PromptBuilder:
+    """
+    Lays out grading requests so they share the longest possible prefix:
+    the static parts (instructions, rubric, related docs) always come first,
+    in the same order, and the per-item text comes last. When the static
+    parts live in a Gemini context cache, requests carry only the per-item
+    text.
+    """
+
+    def __init__(self, instructions: str, rubric: str = "", docs: list = None, cached: bool = False):
+        self.instructions = instructions.rstrip()
+        if rubric.strip():
+            self.instructions += f"\n\nRubric:\n{rubric.strip()}"
+        self.docs = list(docs or [])
+        self.cached = cached
+
+    @property
+    def static_parts(self) -> list:
+        return [] if self.cached else [self.instructions, *self.docs]
+
+    def single(self, item: dict) -> list:
+        """Contents for grading one answer (a JSON object reply)."""
+        return [*self.static_parts, f"{DOCS_NOTE}\n\n{format_item(item, with_id=False)}"]
+
+    def batch(self, items: list) -> list:
+        """Contents for grading several answers in one request (a JSON array reply)."""
+        return [*self.static_parts, "\n".join([DOCS_NOTE, BATCH_INSTRUCTIONS, *(format_item(item) for item in items)])]
+
+    def count_tokens(self, contents: list) -> int:
+        """Estimated tokens of the text parts (uploaded docs are counted by the API, not here)."""
+        return sum(estimate_tokens(part) for part in contents if isinstance(part, str))
+
+    def describe(self) -> str:
+        if self.cached:
+            return "instructions and docs in the context cache"
+        return f"~{estimate_tokens(self.instructions)} instruction tokens + {len(self.docs)} doc(s)"
@@ -0,0 +1,127 @@
+import re
+
+# ---------------- Strategies ----------------
+# Per-question "strategy" in reference_answers.json:
+#   auto    - MCQ / numeric rules when the reference looks like one, else the LLM (default)
+#   mcq     - the answer must be the reference option letter
+#   numeric - numeric comparison within "tolerance" (absolute) / "relative_tolerance"
+#   exact   - normalized text must equal the reference
+#   llm     - always graded by the model
+STRATEGIES = ("auto", "mcq", "numeric", "exact", "llm")
+
+# Same question "type" vocabulary as text_recognition/answer_types.py
+TYPE_STRATEGIES = {"mcq": "mcq", "numeric": "numeric"}
+
+OPTION_PATTERN = re.compile(r"^(?:option|ans(?:wer)?)?\s*[\(\[]?\s*([a-z])\s*[\)\]\.:]?$")
+# A number at the start of the answer, then whatever follows it
+LEADING_NUMBER_PATTERN = re.compile(r"^([-+]?(?:\d+(?:,\d{3})*(?:\.\d*)?|\.\d+)(?:e[-+]?\d+)?)\s*(.*)$")
+# A unit starts with a letter or symbol (so "2 3" or "H2O" are not number + unit)
+UNIT_PATTERN = re.compile(r"^[a-z°%µ][a-z°%µ/\^\d\.]*(?: [a-z°%µ/\^\d\.]+)?$")
+# Units that let a reference answer be detected as numeric without a "units" list
+KNOWN_UNITS = (
+    "%", "°", "°c", "°f", "k", "deg", "degrees", "rad",
+    "mm", "cm", "m", "km", "mg", "g", "kg", "ms", "s", "min", "h", "hr", "hrs",
+    "ml", "l", "n", "j", "kj", "w", "kw", "v", "a", "hz", "pa", "kpa", "mol",
+    "m/s", "km/h", "m/s^2", "m/s2", "cm^2", "cm2", "m^2", "m2", "cm^3", "cm3", "m^3", "m3",
+)
+
+
+def normalize_text(text) -> str:
+    """Lower-cases and collapses whitespace and surrounding punctuation."""
+    text = re.sub(r"\s+", " ", str(text or "").strip().lower())
+    return text.strip(" .,;:!?\"'")
+
+
+def parse_option(text):
+    """'C', '(c)', 'c.', 'option c' -> 'c'; None when it is not a single option letter."""
+    match = OPTION_PATTERN.match(normalize_text(text))
+    return match.group(1) if match else None
+
+
+def parse_number(text, units=None):
+    """
+    Reads a number from an answer, dropping thousands separators and a unit
+    after it ('12.5 cm', '1,200 kg', '45%'). Returns None unless the answer
+    starts with the number and is followed by nothing but one of units (when
+    given) or something unit-like.
+    """
+    match = LEADING_NUMBER_PATTERN.match(normalize_text(text))
+    if match is None:
+        return None
+    number, rest = match.groups()
+    if rest:
+        allowed = [normalize_text(u) for u in (units or [])]
+        if allowed:
+            if rest not in allowed:
+                return None
+        elif not UNIT_PATTERN.match(rest) or len(rest.split()) > 2:
+            return None
+    try:
+        return float(number.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def question_strategy(ref_info: dict) -> str:
+    """The grading strategy for a reference entry ("auto" resolved to a concrete one)."""
+    strategy = str(ref_info.get("strategy", "auto")).lower()
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown grading strategy: {strategy}")
+    if strategy != "auto":
+        return strategy
+
+    qtype = ref_info.get("type")
+    if qtype in TYPE_STRATEGIES:
+        return TYPE_STRATEGIES[qtype]
+    if qtype is not None:
+        return "llm"
+    ref_ans = ref_info.get("answer", "")
+    if len(normalize_text(ref_ans)) == 1 and parse_option(ref_ans):
+        return "mcq"
+    # Only a bare number, or a number with one known unit; "H2O" or "CO2" stay with the model
+    if parse_number(ref_ans, ref_info.get("units") or KNOWN_UNITS) is not None:
+        return "numeric"
+    return "llm"
+
+
+# ---------------- Rule Grading ----------------
+def grade_with_rules(student_ans, ref_info: dict):
+    """
+    Grades an answer without the LLM when its question's strategy allows it.
+    Returns (awarded_marks, feedback), or None when the answer needs the model.
+    """
+    strategy = question_strategy(ref_info)
+    if strategy == "llm":
+        return None
+
+    max_marks = ref_info.get("marks", 0)
+    ref_ans = ref_info.get("answer", "")
+    if not normalize_text(student_ans):
+        return 0, "No answer given."
+
+    if strategy == "mcq":
+        expected, given = parse_option(ref_ans), parse_option(student_ans)
+        if given is None:
+            return 0, f"Not a single option; the correct option is ({expected})."
+        if given == expected:
+            return max_marks, f"Correct option ({expected})."
+        return 0, f"Incorrect option ({given}); the correct option is ({expected})."
+
+    if strategy == "numeric":
+        units = ref_info.get("units")
+        expected, given = parse_number(ref_ans, units), parse_number(student_ans, units)
+        if expected is None:
+            raise ValueError(f"Reference answer is not numeric: {ref_ans!r}")
+        if given is None:
+            # Written-out numbers or working need judgment
+            return None
+        tolerance = max(float(ref_info.get("tolerance", 0)),
+                        abs(expected) * float(ref_info.get("relative_tolerance", 0)))
+        if abs(given - expected) <= tolerance + 1e-9:
+            return max_marks, f"Correct value ({ref_ans})."
+        return 0, f"Incorrect value; expected {ref_ans}."
+
+    # exact
+    if normalize_text(student_ans) == normalize_text(ref_ans):
+        return max_marks, "Matches the reference answer."
+    return 0, f"Does not match the reference answer ({ref_ans})."
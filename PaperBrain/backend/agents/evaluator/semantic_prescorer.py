@@ -0,0 +1,151 @@
+import math
+import os
+from collections import Counter
+
+from answer_clustering import cluster_form
+
+# ---------------- Configuration ----------------
+# Off by default: similarity misses synonyms and abbreviations ("H2O" for "water")
+PRESCORING_ENABLED = os.getenv("PRESCORING", "0") == "1"
+# Only answers up to this many words are pre-scored; longer ones always go to the model
+PRESCORE_MAX_WORDS = int(os.getenv("PRESCORE_MAX_WORDS", "40"))
+# Calibration: a threshold is kept when at least PRECISION of the past answers beyond
+# it got the same grade (full or zero marks), over at least MIN_SAMPLES answers
+CALIBRATION_PRECISION = float(os.getenv("PRESCORE_PRECISION", "0.95"))
+CALIBRATION_MIN_SAMPLES = int(os.getenv("PRESCORE_MIN_SAMPLES", "8"))
+# Calibrated thresholds never go past these bounds
+MIN_HIGH = 0.6
+MAX_LOW = 0.4
+
+NGRAM_SIZES = (3, 4)
+# Past grades that came from the model (directly, via the cache or a cluster)
+MODEL_GRADED = ("llm", "cache", "cluster")
+
+
+def char_ngrams(text) -> Counter:
+    """Character n-grams within words, padded with spaces (like scikit-learn's char_wb)."""
+    grams = Counter()
+    for word in cluster_form(text).split():
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            if len(padded) <= n:
+                grams[padded] += 1
+                continue
+            for i in range(len(padded) - n + 1):
+                grams[padded[i:i + n]] += 1
+    return grams
+
+
+def past_model_grades(results: dict) -> dict:
+    """
+    {question: [(answer, awarded / max marks), ...]} from the model-graded
+    answers in the saved results (evaluation_results.json).
+    """
+    grades = {}
+    for student in results.get("students", []):
+        for qno, details in student.get("answers", {}).items():
+            if details.get("graded_by") not in MODEL_GRADED or not details.get("max_marks"):
+                continue
+            fraction = float(details.get("awarded_marks", 0)) / float(details["max_marks"])
+            grades.setdefault(str(qno), []).append((details.get("answer", ""), fraction))
+    return grades
+
+
+# ---------------- Scoring ----------------
+class QuestionScorer:
+    """TF-IDF cosine similarity to one question's reference answer, with IDF from that question's answers."""
+
+    def __init__(self, reference, corpus: list):
+        documents = [char_ngrams(text) for text in corpus] + [char_ngrams(reference)]
+        frequencies = Counter(gram for grams in documents for gram in grams)
+        total = len(documents)
+        # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in frequencies.items()}
+        self.default_idf = math.log(1 + total) + 1
+        self.reference = self.vector(reference)
+
+    def vector(self, text) -> dict:
+        weights = {gram: count * self.idf.get(gram, self.default_idf) for gram, count in char_ngrams(text).items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {gram: w / norm for gram, w in weights.items()} if norm else {}
+
+    def similarity(self, answer) -> float:
+        vector = self.vector(answer)
+        if len(vector) > len(self.reference):
+            return sum(w * vector.get(gram, 0.0) for gram, w in self.reference.items())
+        return sum(w * self.reference.get(gram, 0.0) for gram, w in vector.items())
+
+
+def calibrate(scored: list, precision: float = CALIBRATION_PRECISION, min_samples: int = CALIBRATION_MIN_SAMPLES):
+    """
+    Chooses (low, high) from past (similarity, awarded fraction) pairs: high is
+    the lowest similarity above which at least `precision` of past answers got
+    full marks, low the highest similarity below which at least `precision`
+    got zero. A side without enough evidence is None.
+    """
+    high = low = None
+    ranked = sorted(scored, key=lambda pair: -pair[0])
+    full = 0
+    for count, (similarity, fraction) in enumerate(ranked, 1):
+        full += fraction >= 0.999
+        if count >= min_samples and full / count >= precision and similarity >= MIN_HIGH:
+            high = similarity
+
+    zero = 0
+    for count, (similarity, fraction) in enumerate(reversed(ranked), 1):
+        zero += fraction <= 0.001
+        if count >= min_samples and zero / count >= precision and similarity <= MAX_LOW:
+            low = similarity
+    return low, high
+
+
+class PreScorer:
+    """
+    Awards clearly right (full marks) and clearly wrong (zero) short answers
+    from their similarity to the reference, so only the uncertain band needs
+    the model. Thresholds are per question: "prescore_low"/"prescore_high" in
+    reference_answers.json when set, else calibrated from past model grades.
+    A question with neither has no band, so all its answers go to the model.
+    """
+
+    def __init__(self, reference_answers: dict, past_grades: dict, items: list):
+        self.reference_answers = reference_answers
+        self.past_grades = past_grades
+        self.answers = {}
+        for item in items:
+            self.answers.setdefault(str(item["qno"]), []).append(item["answer"])
+        self.scorers = {}
+        self.thresholds = {}
+
+    def _setup(self, qno: str):
+        ref_info = self.reference_answers[qno]
+        past = self.past_grades.get(qno, [])
+        scorer = QuestionScorer(ref_info["answer"], self.answers.get(qno, []) + [answer for answer, _ in past])
+        low, high = calibrate([(scorer.similarity(answer), fraction) for answer, fraction in past])
+        source = "calibrated" if low is not None or high is not None else "none"
+        if "prescore_low" in ref_info or "prescore_high" in ref_info:
+            low, high = ref_info.get("prescore_low"), ref_info.get("prescore_high")
+            source = "reference"
+        self.scorers[qno] = scorer
+        self.thresholds[qno] = {"low": None if low is None else round(float(low), 4),
+                                "high": None if high is None else round(float(high), 4),
+                                "source": source, "samples": len(past)}
+
+    def grade(self, item: dict):
+        """(awarded, feedback) for a clear-cut answer, or None when the model should grade it."""
+        qno = str(item["qno"])
+        if len(str(item["answer"]).split()) > PRESCORE_MAX_WORDS:
+            return None
+        if qno not in self.scorers:
+            self._setup(qno)
+        low, high = self.thresholds[qno]["low"], self.thresholds[qno]["high"]
+        if low is None and high is None:
+            return None
+        if low is not None and high is not None and low >= high:
+            return None
+        similarity = self.scorers[qno].similarity(item["answer"])
+        if high is not None and similarity >= high:
+            return item["max_marks"], f"Matches the reference answer (similarity {similarity:.2f})."
+        if low is not None and similarity <= low:
+            return 0, f"Does not match the reference answer (similarity {similarity:.2f})."
+        return None
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+# ---------------- Configuration ----------------
+# USD per million tokens, for cost estimates (response tokens include thinking tokens)
+PROMPT_PRICE_PER_MILLION = float(os.getenv("GEMINI_INPUT_PRICE", "0.30"))
+RESPONSE_PRICE_PER_MILLION = float(os.getenv("GEMINI_OUTPUT_PRICE", "2.50"))
+# How many of the slowest requests a run summary lists
+SLOWEST_REQUESTS = 5
+
+TOTAL_FIELDS = ("prompt_tokens", "response_tokens", "latency_ms", "cost_usd")
+
+
+def estimate_cost(prompt_tokens: float, response_tokens: float) -> float:
+    return (prompt_tokens * PROMPT_PRICE_PER_MILLION + response_tokens * RESPONSE_PRICE_PER_MILLION) / 1_000_000
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MeteredModel:
+    """Passes generate_content to a model, recording each attempt's latency and token usage."""
+
+    def __init__(self, model, record: dict, lock: threading.Lock):
+        self.model = model
+        self.record = record
+        self._lock = lock
+
+    def generate_content(self, contents=None, generation_config=None):
+        start = time.perf_counter()
+        try:
+            response = self.model.generate_content(contents, generation_config)
+        except Exception as e:
+            with self._lock:
+                self.record["attempts"] += 1
+                self.record["total_latency_ms"] += (time.perf_counter() - start) * 1000
+                self.record["errors"].append(str(e)[:200])
+            raise
+        latency_ms = (time.perf_counter() - start) * 1000
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            self.record["attempts"] += 1
+            self.record["total_latency_ms"] += latency_ms
+            if not self.record["ok"]:
+                # With hedging the first successful attempt is the one used
+                self.record.update({
+                    "ok": True,
+                    "latency_ms": latency_ms,
+                    "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+                    "response_tokens": (getattr(usage, "candidates_token_count", 0) or 0)
+                                       + (getattr(usage, "thoughts_token_count", 0) or 0),
+                })
+        return response
+
+
+# ---------------- Tracker ----------------
+class UsageTracker:
+    """
+    Records every model request of a run (latency, tokens, attempts) and
+    aggregates them per answer, question, student and run. A request's
+    tokens, latency and cost are split evenly over the answers it graded.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def meter(self, model, kind: str, items: list, estimated_tokens: int = 0) -> MeteredModel:
+        """Wraps model for one request (kind "single" or "batch") grading items."""
+        record = {"kind": kind, "model": self.model_name, "items": [item["id"] for item in items],
+                  "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "estimated_prompt_tokens": estimated_tokens,
+                  "ok": False, "attempts": 0, "latency_ms": 0.0, "total_latency_ms": 0.0,
+                  "prompt_tokens": 0, "response_tokens": 0, "errors": []}
+        with self._lock:
+            self.calls.append(record)
+        return MeteredModel(model, record, self._lock)
+
+    def summary(self, items: list, grades: dict) -> dict:
+        """
+        {"run": totals, "per_question": {...}, "per_student": {...}, "slowest": [...]}
+        for items graded with grades (see Grader.grade_items).
+        """
+        per_item = {item["id"]: {"answers": 1, "model_answers": 0, "cache_hits": 0,
+                                 **{field: 0.0 for field in TOTAL_FIELDS}} for item in items}
+        for call in self.calls:
+            call["cost_usd"] = estimate_cost(call["prompt_tokens"], call["response_tokens"])
+            share = 1 / max(1, len(call["items"]))
+            for item_id in call["items"]:
+                usage = per_item.get(item_id)
+                if usage is None:
+                    continue
+                usage["model_answers"] = 1
+                for field in TOTAL_FIELDS:
+                    usage[field] += call[field] * share
+        for item_id, grade in grades.items():
+            if grade[2] == "cache" and item_id in per_item:
+                per_item[item_id]["cache_hits"] = 1
+
+        def add_up(usages):
+            total = {"answers": 0, "model_answers": 0, "cache_hits": 0, **{field: 0.0 for field in TOTAL_FIELDS}}
+            for usage in usages:
+                for field in total:
+                    total[field] += usage[field]
+            return self._rounded(total)
+
+        by_question, by_student = {}, {}
+        for item in items:
+            by_question.setdefault(str(item["qno"]), []).append(per_item[item["id"]])
+            by_student.setdefault(item["student"], []).append(per_item[item["id"]])
+
+        latencies = [call["latency_ms"] for call in self.calls if call["ok"]]
+        run = add_up(per_item.values())
+        run.update({
+            "model": self.model_name,
+            "requests": len(self.calls),
+            "failed_requests": sum(1 for call in self.calls if not call["ok"]),
+            "attempts": sum(call["attempts"] for call in self.calls),
+            "retries": sum(max(0, call["attempts"] - 1) for call in self.calls),
+            # Unsplit request totals (answers a request left out still cost tokens)
+            "prompt_tokens": sum(call["prompt_tokens"] for call in self.calls),
+            "response_tokens": sum(call["response_tokens"] for call in self.calls),
+            "cost_usd": round(sum(call["cost_usd"] for call in self.calls), 6),
+            "latency_ms": {"p50": round(percentile(latencies, 0.5), 1), "p95": round(percentile(latencies, 0.95), 1),
+                           "max": round(max(latencies, default=0.0), 1)},
+        })
+        slowest = sorted(self.calls, key=lambda call: -call["total_latency_ms"])[:SLOWEST_REQUESTS]
+        return {
+            "run": run,
+            "per_question": {qno: add_up(usages) for qno, usages in by_question.items()},
+            "per_student": {student: add_up(usages) for student, usages in by_student.items()},
+            "slowest": [{"items": call["items"], "kind": call["kind"], "attempts": call["attempts"],
+                         "total_latency_ms": round(call["total_latency_ms"], 1),
+                         "prompt_tokens": call["prompt_tokens"]} for call in slowest],
+        }
+
+    @staticmethod
+    def _rounded(total: dict) -> dict:
+        total["prompt_tokens"] = round(total["prompt_tokens"])
+        total["response_tokens"] = round(total["response_tokens"])
+        total["latency_ms"] = round(total["latency_ms"], 1)
+        total["cost_usd"] = round(total["cost_usd"], 6)
+        return total
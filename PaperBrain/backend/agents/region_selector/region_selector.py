@@ -121,7 +121,9 @@ for image_path in FILLED_IMAGE_PATHS:
     image_base64 = base64.b64encode(buffer).decode('utf-8')
     data_for_agent_2 = {
         "image_base64": image_base64,
-        "rois": bounding_boxes
+        "rois": bounding_boxes,
+        # Lets Agent 2 subtract the printed template before its blank-answer check
+        "template_path": os.path.abspath(BLANK_IMAGE_PATH)
     }
     json_filename = f"agent1_output/{file_name_only}_data.json"
     with open(json_filename, 'w') as f:
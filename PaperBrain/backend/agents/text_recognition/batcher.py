@@ -0,0 +1,158 @@
+import bisect
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+# --- 1. Histograms ---
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+QUEUE_WAIT_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 250, 1000]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Each bucket counts observations <= its bound;
+    the last bucket ("+Inf") catches everything larger.
+    """
+
+    def __init__(self, bounds: list) -> None:
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.total += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = [str(b) for b in self.bounds] + ["+Inf"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.total,
+                "mean": round(self.sum / self.total, 3) if self.total else 0.0,
+            }
+
+
+# --- 2. Micro-batching Scheduler ---
+class _SheetRequest:
+    """One sheet's crops and the slots its results are routed back into."""
+
+    def __init__(self, size: int) -> None:
+        self.future = Future()
+        self.results = [None] * size
+        self.remaining = size
+        self.lock = threading.Lock()
+
+    def fill(self, slot: int, result) -> None:
+        with self.lock:
+            self.results[slot] = result
+            self.remaining -= 1
+            if self.remaining == 0 and not self.future.done():
+                self.future.set_result(self.results)
+
+    def fail(self, error: Exception) -> None:
+        with self.lock:
+            if self.future.done():
+                return
+            self.future.set_exception(error)
+
+
+class MicroBatcher:
+    """
+    Collects ROI crops from every in-flight sheet and runs them through the
+    recognizer together. A batch is dispatched once it holds max_batch_size
+    crops or the oldest crop has waited max_wait_ms, whichever comes first.
+
+    engine(crops, specs=specs) must return one result per crop, in order;
+    specs carries each crop's decoding constraint (see recognizer.recognize_crops).
+    """
+
+    def __init__(self, engine, max_batch_size: int = 32, max_wait_ms: float = 20.0) -> None:
+        self.engine = engine
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_waits_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="ocr-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, crops: list, specs: list = None) -> Future:
+        """
+        Queues one sheet's crops (with an optional decoding spec per crop).
+        The returned future resolves to the list of results in the same order as crops.
+        """
+        request = _SheetRequest(len(crops))
+        if not crops:
+            request.future.set_result([])
+            return request.future
+
+        enqueued = time.perf_counter()
+        specs = specs or [None] * len(crops)
+        for slot, (crop, spec) in enumerate(zip(crops, specs)):
+            self._queue.put((request, slot, crop, spec, enqueued))
+        return request.future
+
+    def recognize(self, crops: list, specs: list = None) -> list:
+        """Blocking helper: submit and wait for this sheet's results."""
+        return self.submit(crops, specs).result()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_waits_ms.snapshot(),
+        }
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first) -> list:
+        """Gathers up to max_batch_size items, waiting until the first one's deadline."""
+        batch = [first]
+        deadline = first[4] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the shutdown marker so the loop sees it after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            dispatched = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, _, _, _, enqueued in batch:
+                self.queue_waits_ms.observe((dispatched - enqueued) * 1000.0)
+
+            try:
+                results = self.engine([item[2] for item in batch], specs=[item[3] for item in batch])
+            except Exception as e:
+                print(f"[Batcher] Recognizer batch of {len(batch)} failed: {e}", file=sys.stderr)
+                for request, *_ in batch:
+                    request.fail(e)
+                continue
+
+            for (request, slot, *_), result in zip(batch, results):
+                request.fill(slot, result)
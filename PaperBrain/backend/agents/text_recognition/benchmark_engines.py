@@ -0,0 +1,83 @@
+"""
+Ranks the registered OCR engines on a folder of labelled ROI crops by
+accuracy, then throughput.
+
+Crops are labelled by file name, as in benchmark_recognizer.py:
+"b_sheet3_q7.png" -> "b". Each crop is read with the spec its label would
+get as a reference answer (answer_types.py), as in the pipeline.
+
+Usage:
+    python benchmark_engines.py CROP_DIR [--engines easyocr,trocr,tesseract-char] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+
+import ocr_engines
+from answer_types import classify_answer
+from benchmark_recognizer import load_crops
+
+
+def label_specs(labels):
+    """The (allowlist, decoder) each label gets as a reference answer, e.g. MCQ letters or digits."""
+    specs = []
+    for label in labels:
+        spec = classify_answer({"answer": label})
+        specs.append((spec["allowlist"], spec["decoder"]))
+    return specs
+
+
+def benchmark_engine(name, crops, labels, repeat):
+    """Measures one engine's accuracy, per-crop latency and throughput."""
+    engine = ocr_engines.get_engine(name)
+    start = time.perf_counter()
+    engine.load()
+    load_s = time.perf_counter() - start
+
+    specs = label_specs(labels)
+    results = engine.recognize(crops, specs=specs)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = engine.recognize(crops, specs=specs)
+    elapsed = time.perf_counter() - start
+
+    correct = sum(1 for (text, _), label in zip(results, labels) if text.lower().strip() == label)
+    return {
+        "engine": name,
+        "load_s": load_s,
+        "ms_per_crop": elapsed * 1000 / (repeat * len(crops)),
+        "crops_per_s": repeat * len(crops) / elapsed,
+        "accuracy": correct / len(crops),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank OCR engines on labelled crops.")
+    parser.add_argument("crop_dir", help="Folder of crops named '<answer>_<anything>.png'")
+    parser.add_argument("--engines", default=",".join(ocr_engines.available_engines()),
+                        help="Comma-separated engine names to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the crop set")
+    args = parser.parse_args()
+
+    crops, labels = load_crops(args.crop_dir)
+    if not crops:
+        print(f"Error: No crops found in '{args.crop_dir}'.")
+        return
+
+    print(f"Benchmarking {len(crops)} crops x {args.repeat} passes")
+    reports = []
+    for name in args.engines.split(","):
+        try:
+            reports.append(benchmark_engine(name.strip(), crops, labels, args.repeat))
+        except Exception as e:
+            print(f"Skipping engine '{name}': {e}", file=sys.stderr)
+
+    reports.sort(key=lambda r: (-r["accuracy"], -r["crops_per_s"]))
+    print(f"\n{'rank':<5} {'engine':<16} {'accuracy':>9} {'crops/s':>9} {'ms/crop':>9} {'load (s)':>9}")
+    for rank, report in enumerate(reports, 1):
+        print(f"{rank:<5} {report['engine']:<16} {report['accuracy']:>8.1%} {report['crops_per_s']:>9.1f} "
+              f"{report['ms_per_crop']:>9.2f} {report['load_s']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Times crop preprocessing separately from recognizer inference, to show
+which side of recognize_crops dominates.
+
+For each batch size it measures:
+  - easyocr   : easyocr's own path (compute_ratio_and_resize + AlignCollate)
+  - vectorized: preprocess.prepare_batch
+  - inference : one recognizer forward pass + decoding on the prepared batch
+
+Usage:
+    python benchmark_preprocess.py CROP_DIR [--batch-sizes 1,8,32] [--repeat 20] [--no-inference]
+"""
+import argparse
+import math
+import time
+
+import recognizer as ocr
+from benchmark_recognizer import load_crops
+from preprocess import MODEL_HEIGHT, batch_width, prepare_batch, to_grey
+
+
+def easyocr_preprocess(crops):
+    """easyocr's per-crop preprocessing, as get_text used to run it."""
+    from easyocr.recognition import AlignCollate
+    from easyocr.utils import compute_ratio_and_resize
+    from PIL import Image
+
+    images, max_width = [], MODEL_HEIGHT
+    for crop in crops:
+        grey = to_grey(crop)
+        h, w = grey.shape[:2]
+        resized, ratio = compute_ratio_and_resize(grey, w, h, MODEL_HEIGHT)
+        images.append(Image.fromarray(resized, 'L'))
+        max_width = max(max_width, math.ceil(ratio) * MODEL_HEIGHT)
+    return AlignCollate(imgH=MODEL_HEIGHT, imgW=max_width, keep_ratio_with_pad=True)(images)
+
+
+def time_ms(fn, repeat):
+    """Mean wall time of fn() in milliseconds."""
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR preprocessing vs inference.")
+    parser.add_argument("crop_dir", help="Folder of ROI crops")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma-separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes per measurement")
+    parser.add_argument("--no-inference", action="store_true", help="Only time preprocessing")
+    args = parser.parse_args()
+
+    crops, _ = load_crops(args.crop_dir)
+    if not crops:
+        print(f"Error: No crops found in '{args.crop_dir}'.")
+        return
+
+    reader = None if args.no_inference else ocr.load_reader()
+    print(f"{'batch':>6} {'easyocr (ms)':>13} {'vectorized (ms)':>16} {'inference (ms)':>15} {'preprocess share':>17}")
+    for size in (int(s) for s in args.batch_sizes.split(",")):
+        # Cycle through the crop set to fill the batch
+        batch = [crops[k % len(crops)] for k in range(size)]
+        width = batch_width(batch)
+        specs = [(ocr.DEFAULT_ALLOWLIST, "greedy")] * size
+
+        legacy_ms = time_ms(lambda: easyocr_preprocess(batch), args.repeat)
+        vectorized_ms = time_ms(lambda: prepare_batch(batch, width=width), args.repeat)
+
+        if reader is None:
+            print(f"{size:>6} {legacy_ms:>13.2f} {vectorized_ms:>16.2f} {'-':>15} {'-':>17}")
+            continue
+        prepared = prepare_batch(batch, width=width)
+        inference_ms = time_ms(lambda: ocr.predict_batch(reader, prepared, specs), args.repeat)
+        share = vectorized_ms / (vectorized_ms + inference_ms)
+        print(f"{size:>6} {legacy_ms:>13.2f} {vectorized_ms:>16.2f} {inference_ms:>15.2f} {share:>16.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compares the recognizer modes (float / quantized / torchscript) on a folder
+of labelled ROI crops.
+
+Crops are labelled by their file name: everything before the first "_" is
+the expected answer, e.g. "b_sheet3_q7.png" -> "b". Crops saved in
+debug_crops/ can be renamed this way to build a benchmark set;
+tests/fixtures/crops is a small fixed one.
+
+Usage:
+    python benchmark_recognizer.py CROP_DIR [--modes float,quantized,torchscript] [--repeat 5]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+import recognizer as ocr
+
+
+def load_crops(crop_dir):
+    """Returns (crops, labels) for every image in crop_dir."""
+    crops, labels = [], []
+    for path in sorted(glob.glob(os.path.join(crop_dir, "*.png")) + glob.glob(os.path.join(crop_dir, "*.jpg"))):
+        crop = cv2.imread(path, cv2.IMREAD_COLOR)
+        if crop is None:
+            print(f"Skipping unreadable crop: {path}", file=sys.stderr)
+            continue
+        crops.append(crop)
+        labels.append(os.path.basename(path).split("_")[0].lower())
+    return crops, labels
+
+
+def benchmark_mode(mode, crops, labels, repeat):
+    """Loads one recognizer mode and measures its load time, latency and accuracy."""
+    start = time.perf_counter()
+    reader = ocr.build_reader(mode)
+    load_s = time.perf_counter() - start
+
+    # Warm-up pass (first calls allocate buffers / run the JIT profiler)
+    results = ocr.recognize_crops(crops, reader=reader)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = ocr.recognize_crops(crops, reader=reader)
+    ms_per_crop = (time.perf_counter() - start) * 1000 / (repeat * len(crops))
+
+    correct = sum(1 for (text, _), label in zip(results, labels) if text.lower().strip() == label)
+    return {
+        "load_s": load_s,
+        "ms_per_crop": ms_per_crop,
+        "accuracy": correct / len(crops),
+        "answers": [text.lower().strip() for text, _ in results],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR recognizer modes on labelled crops.")
+    parser.add_argument("crop_dir", help="Folder of crops named '<answer>_<anything>.png'")
+    parser.add_argument("--modes", default="float,quantized,torchscript",
+                        help="Comma-separated recognizer modes to compare")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the crop set")
+    args = parser.parse_args()
+
+    crops, labels = load_crops(args.crop_dir)
+    if not crops:
+        print(f"Error: No crops found in '{args.crop_dir}'.")
+        return
+
+    print(f"Benchmarking {len(crops)} crops x {args.repeat} passes")
+    reports = {}
+    for mode in args.modes.split(","):
+        reports[mode] = benchmark_mode(mode.strip(), crops, labels, args.repeat)
+
+    baseline = reports.get("float")
+    print(f"\n{'mode':<12} {'load (s)':>9} {'ms/crop':>9} {'speedup':>8} {'accuracy':>9} {'agrees':>7}")
+    for mode, report in reports.items():
+        speedup = baseline["ms_per_crop"] / report["ms_per_crop"] if baseline else 1.0
+        # Fraction of crops where this mode reads the same text as fp32
+        agrees = (sum(a == b for a, b in zip(report["answers"], baseline["answers"])) / len(crops)
+                  if baseline else 1.0)
+        print(f"{mode:<12} {report['load_s']:>9.2f} {report['ms_per_crop']:>9.2f} "
+              f"{speedup:>7.2f}x {report['accuracy']:>8.1%} {agrees:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
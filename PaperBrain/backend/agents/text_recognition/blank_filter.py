@@ -0,0 +1,91 @@
+import os
+
+import cv2
+import numpy as np
+
+# --- 1. Thresholds ---
+# A pixel counts as ink when it is this much darker than the template (or,
+# without a template, than the crop's paper background).
+INK_DIFF_THRESHOLD = int(os.getenv("BLANK_INK_DIFF", "40"))
+# Connected components smaller than this (pixels) are specks / scan noise
+MIN_COMPONENT_AREA = int(os.getenv("BLANK_MIN_COMPONENT_AREA", "15"))
+# Below this fraction of ink pixels the crop is treated as an unanswered ROI
+MIN_INK_RATIO = float(os.getenv("BLANK_MIN_INK_RATIO", "0.004"))
+
+
+def _to_grey(img: np.ndarray) -> np.ndarray:
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def ink_mask(crop: np.ndarray, template_crop: np.ndarray = None) -> np.ndarray:
+    """
+    Binarizes a crop into ink (1) / paper (0), subtracting the printed
+    template where one is available.
+    """
+    grey = cv2.GaussianBlur(_to_grey(crop), (3, 3), 0)
+    if template_crop is not None and template_crop.shape[:2] == grey.shape:
+        template_grey = cv2.GaussianBlur(_to_grey(template_crop), (3, 3), 0)
+        # Saturating subtract: only pixels darker than the template survive
+        darker = cv2.subtract(template_grey, grey)
+    else:
+        background = np.percentile(grey, 90)
+        darker = np.clip(background - grey.astype(np.int16), 0, 255).astype(np.uint8)
+    return (darker > INK_DIFF_THRESHOLD).astype(np.uint8)
+
+
+# --- 2. Batched Ink Statistics ---
+def ink_stats(crops: list, template_crops: list = None) -> dict:
+    """
+    Measures ink for every crop with a single connected-components pass.
+
+    All masks are stacked on one canvas with a blank row between them, so
+    components never span two crops; per-crop totals are then gathered
+    with np.bincount. Returns arrays (one entry per crop) of kept ink
+    pixels, ink ratio, component count and largest component area.
+    """
+    n = len(crops)
+    empty = {
+        "ink_pixels": np.zeros(n), "ink_ratio": np.zeros(n),
+        "components": np.zeros(n, dtype=int), "largest_component": np.zeros(n),
+    }
+    if n == 0:
+        return empty
+
+    templates = template_crops or [None] * n
+    masks = [ink_mask(c, t) if c.size else np.zeros((1, 1), np.uint8) for c, t in zip(crops, templates)]
+
+    heights = np.array([m.shape[0] + 1 for m in masks])  # +1 = separator row
+    offsets = np.concatenate(([0], np.cumsum(heights)[:-1]))
+    canvas = np.zeros((int(heights.sum()), max(m.shape[1] for m in masks)), np.uint8)
+    for mask, y in zip(masks, offsets):
+        canvas[y:y + mask.shape[0], :mask.shape[1]] = mask
+
+    _, _, comp_stats, _ = cv2.connectedComponentsWithStats(canvas, connectivity=8)
+    comp_stats = comp_stats[1:]  # label 0 is the background
+    if len(comp_stats) == 0:
+        return empty
+
+    areas = comp_stats[:, cv2.CC_STAT_AREA]
+    owner = np.searchsorted(offsets, comp_stats[:, cv2.CC_STAT_TOP], side="right") - 1
+    keep = areas >= MIN_COMPONENT_AREA
+
+    crop_areas = np.array([max(1, m.size) for m in masks], dtype=float)
+    ink_pixels = np.bincount(owner[keep], weights=areas[keep], minlength=n)
+    largest = np.zeros(n)
+    np.maximum.at(largest, owner[keep], areas[keep])
+
+    return {
+        "ink_pixels": ink_pixels,
+        "ink_ratio": ink_pixels / crop_areas,
+        "components": np.bincount(owner[keep], minlength=n),
+        "largest_component": largest,
+    }
+
+
+def find_blank(crops: list, template_crops: list = None, min_ink_ratio: float = MIN_INK_RATIO) -> np.ndarray:
+    """
+    Returns a boolean array marking crops with no meaningful ink: empty
+    ROIs and ROIs holding only stray marks below the ink threshold.
+    """
+    stats = ink_stats(crops, template_crops)
+    return (stats["components"] == 0) | (stats["ink_ratio"] < min_ink_ratio)
@@ -0,0 +1,236 @@
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+from blank_filter import ink_mask
+
+# --- 1. Configuration ---
+# Every single-glyph answer answer_types.py produces: MCQ options and digits (with a minus sign)
+GLYPH_CLASSES = os.getenv("GLYPH_CLASSES", "abcd0123456789-")
+GLYPH_SIZE = 28            # normalized glyph canvas (MNIST-style)
+GLYPH_BOX = 20             # the glyph's longer side inside the canvas
+CELL = 7                   # HOG cell size -> 4x4 cells
+BINS = 9                   # unsigned orientation bins
+# Below this probability the crop falls back to EasyOCR
+MIN_CONFIDENCE = float(os.getenv("GLYPH_MIN_CONFIDENCE", "0.9"))
+# Ink wider than this (relative to its height) is treated as more than one glyph
+MAX_GLYPH_ASPECT = 1.3
+MODEL_VERSION = 2
+MODEL_PATH = os.getenv("GLYPH_MODEL_PATH", os.path.join("ocr_cache", f"glyph_model_v{MODEL_VERSION}.npz"))
+
+FONTS = [
+    cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_COMPLEX,
+    cv2.FONT_HERSHEY_TRIPLEX, cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, cv2.FONT_HERSHEY_SCRIPT_COMPLEX,
+    cv2.FONT_HERSHEY_PLAIN,
+]
+
+
+# --- 2. Glyph Normalization & Features ---
+def normalize_glyph(mask: np.ndarray):
+    """
+    Crops a binary ink mask to its ink, fits it into a GLYPH_BOX square and
+    centers it on a GLYPH_SIZE canvas. Returns (glyph, aspect) or (None, 0)
+    when there is no ink.
+    """
+    ys, xs = np.nonzero(mask)
+    if len(ys) == 0:
+        return None, 0.0
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    ink = mask[y0:y1, x0:x1].astype(np.float32)
+    h, w = ink.shape
+    scale = GLYPH_BOX / max(h, w)
+    ink = cv2.resize(ink, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+    glyph = np.zeros((GLYPH_SIZE, GLYPH_SIZE), np.float32)
+    top = (GLYPH_SIZE - ink.shape[0]) // 2
+    left = (GLYPH_SIZE - ink.shape[1]) // 2
+    glyph[top:top + ink.shape[0], left:left + ink.shape[1]] = ink
+    return glyph, w / h
+
+
+def hog_features(glyphs: np.ndarray) -> np.ndarray:
+    """
+    Vectorized HOG over a (N, 28, 28) stack: 4x4 cells of 9 unsigned
+    orientation bins, L2-normalized over 2x2 blocks, plus a coarse 7x7
+    intensity map. Returns (N, 324 + 49) features.
+    """
+    n = glyphs.shape[0]
+    gy, gx = np.gradient(glyphs, axis=(1, 2))
+    magnitude = np.hypot(gx, gy)
+    angle = np.mod(np.arctan2(gy, gx), np.pi)
+    bins = np.minimum((angle / np.pi * BINS).astype(np.int64), BINS - 1)
+
+    cells = GLYPH_SIZE // CELL
+    onehot = np.zeros((n, GLYPH_SIZE, GLYPH_SIZE, BINS), np.float32)
+    np.put_along_axis(onehot, bins[..., None], magnitude[..., None], axis=3)
+    hist = onehot.reshape(n, cells, CELL, cells, CELL, BINS).sum(axis=(2, 4))
+
+    blocks = np.concatenate([
+        hist[:, :-1, :-1], hist[:, 1:, :-1], hist[:, :-1, 1:], hist[:, 1:, 1:]
+    ], axis=3).reshape(n, -1, 4 * BINS)
+    blocks /= np.linalg.norm(blocks, axis=2, keepdims=True) + 1e-6
+
+    coarse = glyphs.reshape(n, 7, GLYPH_SIZE // 7, 7, GLYPH_SIZE // 7).mean(axis=(2, 4))
+    return np.concatenate([blocks.reshape(n, -1), coarse.reshape(n, -1)], axis=1)
+
+
+# --- 3. Synthetic Training Data ---
+def synthesize_glyphs(classes: str, per_class: int = 240, seed: int = 0):
+    """
+    Renders every class with the Hershey fonts under random scale, stroke
+    width, rotation and shear, then runs them through the same ink-mask and
+    normalization as real crops. Returns (glyphs, labels).
+    """
+    rng = np.random.default_rng(seed)
+    glyphs, labels = [], []
+    for label, char in enumerate(classes):
+        for k in range(per_class):
+            canvas = np.full((96, 96), 245, np.uint8)
+            font = FONTS[k % len(FONTS)]
+            scale = rng.uniform(1.4, 2.4)
+            thickness = int(rng.integers(2, 6))
+            (tw, th), _ = cv2.getTextSize(char, font, scale, thickness)
+            org = (int((96 - tw) / 2), int((96 + th) / 2))
+            cv2.putText(canvas, char, org, font, scale, 20, thickness, cv2.LINE_AA)
+
+            angle = rng.uniform(-12, 12)
+            shear = rng.uniform(-0.25, 0.25)
+            M = cv2.getRotationMatrix2D((48, 48), angle, 1.0)
+            M[0, 1] += shear
+            canvas = cv2.warpAffine(canvas, M, (96, 96), borderValue=245)
+
+            glyph, _ = normalize_glyph(ink_mask(cv2.cvtColor(canvas, cv2.COLOR_GRAY2BGR)))
+            if glyph is not None:
+                glyphs.append(glyph)
+                labels.append(label)
+    return np.stack(glyphs), np.array(labels)
+
+
+# --- 4. Classifier ---
+class GlyphClassifier:
+    """
+    Softmax regression on HOG features: one matrix product classifies every
+    single-glyph crop of a sheet at once.
+    """
+
+    def __init__(self, classes: str, weights: np.ndarray, mean: np.ndarray, std: np.ndarray) -> None:
+        self.classes = classes
+        self.weights = weights
+        self.mean = mean
+        self.std = std
+
+    @classmethod
+    def train(cls, classes: str, epochs: int = 300, lr: float = 0.5, l2: float = 1e-4):
+        glyphs, labels = synthesize_glyphs(classes)
+        x = hog_features(glyphs)
+        mean, std = x.mean(axis=0), x.std(axis=0) + 1e-6
+        x = np.hstack([(x - mean) / std, np.ones((len(x), 1), np.float32)])
+        y = np.eye(len(classes), dtype=np.float32)[labels]
+
+        weights = np.zeros((x.shape[1], len(classes)), np.float32)
+        for _ in range(epochs):
+            probs = _softmax(x @ weights)
+            grad = x.T @ (probs - y) / len(x) + l2 * weights
+            weights -= lr * grad
+        return cls(classes, weights, mean, std)
+
+    @classmethod
+    def load(cls, path: str):
+        data = np.load(path)
+        return cls(str(data["classes"]), data["weights"], data["mean"], data["std"])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write-then-rename so concurrent processes never load a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, classes=self.classes, weights=self.weights, mean=self.mean, std=self.std)
+        os.replace(tmp_path, path)
+
+    def predict_glyphs(self, glyphs: np.ndarray, allowlists: list = None) -> list:
+        """
+        Returns (char, probability) for each normalized glyph. allowlists
+        optionally restricts each glyph to some of the classes.
+        """
+        if len(glyphs) == 0:
+            return []
+        x = (hog_features(glyphs) - self.mean) / self.std
+        x = np.hstack([x, np.ones((len(x), 1), np.float32)])
+        probs = _softmax(x @ self.weights)
+        if allowlists is not None:
+            for i, allowlist in enumerate(allowlists):
+                if allowlist:
+                    probs[i] *= [c in allowlist for c in self.classes]
+            probs /= np.maximum(probs.sum(axis=1, keepdims=True), 1e-12)
+        best = probs.argmax(axis=1)
+        return [(self.classes[k], float(probs[i, k])) for i, k in enumerate(best)]
+
+    def classify(self, crops: list, template_crops: list = None, allowlists: list = None,
+                 min_confidence: float = MIN_CONFIDENCE) -> list:
+        """
+        Classifies every crop that looks like a single glyph in one call,
+        each restricted to its allowlist (a subset of the classes) when given.
+        Returns (char, probability) per crop, or None where the crop is not a
+        single glyph or the classifier is not confident enough.
+        """
+        templates = template_crops or [None] * len(crops)
+        results = [None] * len(crops)
+        index, glyphs = [], []
+        for i, (crop, template) in enumerate(zip(crops, templates)):
+            if crop.size == 0:
+                continue
+            glyph, aspect = normalize_glyph(_keep_main_ink(ink_mask(crop, template)))
+            if glyph is not None and aspect <= MAX_GLYPH_ASPECT:
+                index.append(i)
+                glyphs.append(glyph)
+
+        if glyphs:
+            allowed = [allowlists[i] for i in index] if allowlists else None
+            for i, (char, prob) in zip(index, self.predict_glyphs(np.stack(glyphs), allowed)):
+                if prob >= min_confidence:
+                    results[i] = (char, prob)
+        return results
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _keep_main_ink(mask: np.ndarray, min_area: int = 15) -> np.ndarray:
+    """Drops specks so the glyph's bounding box is not stretched by noise."""
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    keep = np.zeros(n, bool)
+    keep[1:] = stats[1:, cv2.CC_STAT_AREA] >= min_area
+    return keep[labels].astype(np.uint8)
+
+
+# --- 5. Shared Instance ---
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def load_classifier(classes: str = GLYPH_CLASSES):
+    """
+    Returns the process-wide classifier for these classes, loading it from
+    MODEL_PATH or training it from synthetic glyphs (and saving it) on first use.
+    """
+    global _classifier
+    with _classifier_lock:
+        if _classifier is not None and _classifier.classes == classes:
+            return _classifier
+        if os.path.isfile(MODEL_PATH):
+            model = GlyphClassifier.load(MODEL_PATH)
+            if model.classes == classes:
+                _classifier = model
+                return _classifier
+
+        print(f"[Glyph] Training single-glyph classifier for '{classes}'...", file=sys.stderr)
+        _classifier = GlyphClassifier.train(classes)
+        _classifier.save(MODEL_PATH)
+        print(f"[Glyph] Saved model to {MODEL_PATH}", file=sys.stderr)
+        return _classifier
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+from blank_filter import ink_mask
+
+# --- 1. Configuration ---
+# A row belongs to a text line when its (smoothed) ink exceeds this fraction of the busiest row
+LINE_INK_FRACTION = float(os.getenv("LINE_INK_FRACTION", "0.05"))
+# Bands closer than this (pixels) are one line split by a thin stroke gap
+MIN_LINE_GAP = int(os.getenv("LINE_MIN_GAP", "4"))
+# Bands shorter than this (pixels) are underlines, dots or noise
+MIN_LINE_HEIGHT = int(os.getenv("LINE_MIN_HEIGHT", "8"))
+# Rows of context kept above and below every line
+LINE_PADDING = 4
+SMOOTHING_ROWS = 5
+
+
+def segment_lines(crop: np.ndarray, template_crop: np.ndarray = None) -> list:
+    """
+    Splits a multi-line answer into text lines with a horizontal projection
+    profile: ink per row is smoothed, thresholded, and contiguous bands of
+    inked rows become lines. Returns (y_start, y_end) bands, top to bottom;
+    the whole crop is one band when no line structure is found.
+    """
+    height = crop.shape[0]
+    if crop.size == 0:
+        return []
+
+    profile = ink_mask(crop, template_crop).sum(axis=1).astype(np.float32)
+    kernel = np.ones(SMOOTHING_ROWS, np.float32) / SMOOTHING_ROWS
+    smooth = np.convolve(profile, kernel, mode="same")
+    if smooth.max() <= 0:
+        return [(0, height)]
+
+    inked = smooth > max(1.0, LINE_INK_FRACTION * smooth.max())
+    edges = np.diff(np.concatenate(([0], inked.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # Merge bands separated by thin gaps (e.g. between ascenders and the line body)
+    bands = []
+    for start, end in zip(starts, ends):
+        if bands and start - bands[-1][1] < MIN_LINE_GAP:
+            bands[-1][1] = end
+        else:
+            bands.append([start, end])
+
+    lines = [(max(0, int(s) - LINE_PADDING), min(height, int(e) + LINE_PADDING))
+             for s, e in bands if e - s >= MIN_LINE_HEIGHT]
+    return lines or [(0, height)]
@@ -0,0 +1,226 @@
+"""
+Offline bundle of the EasyOCR weights.
+
+By default easyocr.Reader downloads its weights into ~/.EasyOCR on first use.
+This module packs them once into a versioned local folder with a checksum
+manifest, and loads the recognizer strictly from that folder so the OCR
+service never touches the network at startup.
+
+Usage:
+    python model_bundle.py pack [--source DIR] [--out DIR] [--recognizer-only]
+    python model_bundle.py verify [DIR]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+# --- 1. Configuration ---
+# Bundles live under MODEL_ROOT in a folder named after the easyocr version
+# and weights (see default_bundle_dir); OCR_MODEL_DIR points at one directly.
+MODEL_ROOT = os.getenv("OCR_MODEL_ROOT", "models")
+MODEL_DIR = os.getenv("OCR_MODEL_DIR", "")
+# With OCR_OFFLINE=1 a missing bundle is an error instead of a download
+OFFLINE = os.getenv("OCR_OFFLINE", "0") == "1"
+MANIFEST_NAME = "manifest.json"
+
+RECOGNITION_MODEL = "english_g2"   # what easyocr picks for lang_list=['en']
+DETECTION_MODEL = "craft"          # packed for completeness; ROIs never need detection
+# gen2 recognizer architecture, as easyocr.Reader sets it
+NETWORK_PARAMS = {"input_channel": 1, "output_channel": 256, "hidden_size": 256}
+
+
+def bundle_models(include_detector: bool = True) -> dict:
+    """The easyocr model-zoo entries that go into a bundle, by kind."""
+    from easyocr.config import detection_models, recognition_models
+
+    models = {"recognizer": recognition_models["gen2"][RECOGNITION_MODEL]}
+    if include_detector:
+        models["detector"] = detection_models[DETECTION_MODEL]
+    return models
+
+
+def default_bundle_dir(root: str = MODEL_ROOT) -> str:
+    """Versioned bundle folder: a new easyocr release or new weights get a new folder."""
+    import easyocr
+
+    weights_md5 = bundle_models(False)["recognizer"]["md5sum"]
+    return os.path.join(root, f"easyocr-{easyocr.__version__}-{RECOGNITION_MODEL}-{weights_md5[:8]}")
+
+
+def bundle_dir() -> str:
+    return MODEL_DIR or default_bundle_dir()
+
+
+def file_digest(path: str, algorithm: str = "sha256") -> str:
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# --- 2. Pack / Verify ---
+def pack(out_dir: str = None, source_dir: str = None, include_detector: bool = True) -> str:
+    """
+    Builds a bundle in out_dir (default: default_bundle_dir()). Weights are
+    copied from source_dir (an existing easyocr model folder, e.g.
+    ~/.EasyOCR/model) when they are there with the right md5, otherwise
+    downloaded from easyocr's model zoo. The bundle is written to a temporary
+    folder and renamed into place, so a half-packed bundle is never loaded.
+    Returns the bundle folder.
+    """
+    import easyocr
+    from easyocr.utils import download_and_unzip
+
+    out_dir = out_dir or default_bundle_dir()
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".bundle-", dir=parent)
+
+    manifest = {"easyocr_version": easyocr.__version__, "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "files": {}}
+    try:
+        for kind, model in bundle_models(include_detector).items():
+            filename = model["filename"]
+            target = os.path.join(staging, filename)
+            source = os.path.join(source_dir, filename) if source_dir else None
+
+            if source and os.path.isfile(source) and file_digest(source, "md5") == model["md5sum"]:
+                shutil.copyfile(source, target)
+                print(f"[Bundle] Copied {filename} from {source_dir}", file=sys.stderr)
+            else:
+                print(f"[Bundle] Downloading {filename} from {model['url']}", file=sys.stderr)
+                download_and_unzip(model["url"], filename, staging, verbose=False)
+
+            if file_digest(target, "md5") != model["md5sum"]:
+                raise ValueError(f"{filename} does not match easyocr's md5 {model['md5sum']}")
+            manifest["files"][filename] = {"kind": kind, "sha256": file_digest(target),
+                                           "md5": model["md5sum"], "bytes": os.path.getsize(target),
+                                           "url": model["url"]}
+
+        with open(os.path.join(staging, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.isdir(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(staging, out_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    print(f"[Bundle] Packed {len(manifest['files'])} model(s) into {out_dir}", file=sys.stderr)
+    return out_dir
+
+
+def verify(directory: str, filenames: list = None) -> dict:
+    """
+    Checks the bundle's files (or only filenames) against its manifest.
+    Returns the manifest; raises FileNotFoundError / ValueError otherwise.
+    """
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        raise FileNotFoundError(f"No model bundle at {directory} (run: python model_bundle.py pack)")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    for filename in filenames or list(manifest["files"]):
+        entry = manifest["files"].get(filename)
+        path = os.path.join(directory, filename)
+        if entry is None or not os.path.isfile(path):
+            raise FileNotFoundError(f"{filename} is missing from the model bundle at {directory}")
+        if os.path.getsize(path) != entry["bytes"] or file_digest(path) != entry["sha256"]:
+            raise ValueError(f"{path} does not match its checksum in {MANIFEST_NAME}")
+    return manifest
+
+
+# --- 3. Load ---
+def load_weights(path: str) -> dict:
+    """
+    Loads a state dict memory-mapped where the file format allows it, so the
+    weights stay backed by the page cache (shared between processes) instead
+    of being read into private memory. Legacy (non-zip) files fall back to a
+    normal load.
+    """
+    import torch
+
+    try:
+        return torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+    except RuntimeError:
+        return torch.load(path, map_location="cpu", weights_only=True)
+
+
+def empty_reader(storage_dir: str = None):
+    """An easyocr Reader with neither model loaded (nothing is downloaded)."""
+    import easyocr
+
+    kwargs = {"model_storage_directory": storage_dir, "download_enabled": False} if storage_dir else {}
+    return easyocr.Reader(['en'], gpu=False, verbose=False, detector=False, recognizer=False, **kwargs)
+
+
+def load_reader(quantize: bool = True):
+    """
+    Returns an EasyOCR reader with the recognition model loaded from the
+    bundle, verified against the manifest. Without a bundle it raises when
+    OCR_OFFLINE=1, and otherwise falls back to easyocr's own download.
+    """
+    import easyocr
+    import torch
+    from easyocr.config import BASE_PATH
+    from easyocr.model.vgg_model import Model
+    from easyocr.utils import CTCLabelConverter
+
+    directory = bundle_dir()
+    if not os.path.isfile(os.path.join(directory, MANIFEST_NAME)):
+        if OFFLINE or MODEL_DIR:
+            raise FileNotFoundError(f"No model bundle at {directory} (run: python model_bundle.py pack)")
+        print(f"[Bundle] No model bundle at {directory}; easyocr may download its weights", file=sys.stderr)
+        return easyocr.Reader(['en'], gpu=False, verbose=False, detector=False, quantize=quantize)
+
+    filename = bundle_models(False)["recognizer"]["filename"]
+    verify(directory, [filename])
+
+    reader = empty_reader(directory)
+    reader.converter = CTCLabelConverter(reader.character, {}, {"en": os.path.join(BASE_PATH, "dict", "en.txt")})
+    model = Model(num_class=len(reader.converter.character), **NETWORK_PARAMS)
+
+    # Checkpoints were saved from DataParallel, hence the "module." prefix
+    state_dict = OrderedDict((key[7:] if key.startswith("module.") else key, value)
+                             for key, value in load_weights(os.path.join(directory, filename)).items())
+    # assign=True keeps the (memory-mapped) tensors instead of copying them into fresh parameters
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    if quantize:
+        torch.quantization.quantize_dynamic(model, dtype=torch.qint8, inplace=True)
+    reader.recognizer = model
+    print(f"[Bundle] Loaded {filename} from {directory}", file=sys.stderr)
+    return reader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack or verify the offline EasyOCR model bundle.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_parser = sub.add_parser("pack", help="Copy or download the weights into a bundle")
+    pack_parser.add_argument("--source", help="Existing easyocr model folder to copy from (e.g. ~/.EasyOCR/model)")
+    pack_parser.add_argument("--out", help="Bundle folder (default: versioned folder under OCR_MODEL_ROOT)")
+    pack_parser.add_argument("--recognizer-only", action="store_true", help="Skip the CRAFT detector weights")
+    verify_parser = sub.add_parser("verify", help="Check a bundle against its manifest")
+    verify_parser.add_argument("directory", nargs="?", help="Bundle folder (default: the configured bundle)")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        source = os.path.expanduser(args.source) if args.source else None
+        print(pack(args.out, source, include_detector=not args.recognizer_only))
+    else:
+        directory = args.directory or bundle_dir()
+        manifest = verify(directory)
+        print(f"OK: {len(manifest['files'])} file(s) in {directory} match {MANIFEST_NAME}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import sys
+
+# --- 1. Configuration ---
+ARTIFACT_DIR = os.getenv("OCR_ARTIFACT_DIR", "ocr_cache")
+# The single recognition model easyocr picks for lang_list=['en']
+RECOGNITION_MODEL = "english_g2"
+
+
+def artifact_path() -> str:
+    """
+    Location of the exported recognizer. The name changes whenever the
+    weights, torch or easyocr version change, so stale exports are never loaded.
+    """
+    import easyocr
+    import torch
+    from easyocr.config import recognition_models
+
+    weights_md5 = recognition_models["gen2"][RECOGNITION_MODEL]["md5sum"]
+    tag = hashlib.sha1(f"{weights_md5}|{torch.__version__}|{easyocr.__version__}".encode()).hexdigest()[:12]
+    return os.path.join(ARTIFACT_DIR, f"{RECOGNITION_MODEL}_int8_{tag}.pt")
+
+
+# --- 2. Export ---
+def quantize_recognizer(model):
+    """Applies dynamic int8 quantization to the model's Linear and LSTM layers."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+    )
+
+
+def export_recognizer(model, path: str):
+    """
+    Traces the (quantized) recognizer to TorchScript and saves it to path.
+    The trace keeps batch and width dynamic, which is all get_text() varies.
+    Returns the traced module.
+    """
+    import torch
+
+    model.eval()
+    example = (torch.zeros(2, 1, 64, 256), torch.zeros(2, 26, dtype=torch.long))
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example, check_trace=False)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.jit.save(traced, tmp_path)
+    os.replace(tmp_path, path)
+    print(f"[Export] Saved TorchScript recognizer to {path}", file=sys.stderr)
+    return traced
+
+
+# --- 3. Load ---
+def load_torchscript_reader():
+    """
+    Returns an EasyOCR reader whose recognizer is the cached TorchScript
+    export. On the first start the fp32 model is loaded, quantized, traced
+    and saved; later starts skip model construction entirely.
+    """
+    import torch
+    from easyocr.config import BASE_PATH
+    from easyocr.utils import CTCLabelConverter
+
+    import model_bundle
+
+    path = artifact_path()
+    if os.path.isfile(path):
+        directory = model_bundle.bundle_dir()
+        reader = model_bundle.empty_reader(directory if os.path.isdir(directory) else None)
+        reader.recognizer = torch.jit.load(path, map_location="cpu")
+        dict_list = {"en": os.path.join(BASE_PATH, "dict", "en.txt")}
+        reader.converter = CTCLabelConverter(reader.character, {}, dict_list)
+        print(f"[Export] Loaded TorchScript recognizer from {path}", file=sys.stderr)
+        return reader
+
+    reader = model_bundle.load_reader(quantize=False)
+    reader.recognizer = export_recognizer(quantize_recognizer(reader.recognizer), path)
+    return reader
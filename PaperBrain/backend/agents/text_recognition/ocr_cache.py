@@ -0,0 +1,128 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# --- 1. Configuration ---
+DEFAULT_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "ocr_cache")
+DEFAULT_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "200000"))
+DEFAULT_MEMORY_ENTRIES = int(os.getenv("OCR_CACHE_MEMORY_ENTRIES", "4096"))
+# Counting rows is a table scan, so the size bound is checked every N writes
+EVICTION_CHECK_INTERVAL = 256
+
+
+def crop_key(crop: np.ndarray, engine: str, allowlist: str, padding: int) -> str:
+    """
+    Hashes the normalized (grayscale, contiguous) crop pixels together with
+    everything else that changes what the recognizer would return.
+    """
+    if crop.ndim == 3 and crop.size:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    crop = np.ascontiguousarray(crop)
+
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{engine}|{allowlist}|{padding}|{crop.shape}|{crop.dtype.str}".encode("utf-8"))
+    h.update(crop.tobytes())
+    return h.hexdigest()
+
+
+# --- 2. Cache ---
+class OCRCache:
+    """
+    Two-level cache of recognizer results keyed by crop_key().
+
+    An in-memory LRU sits in front of an on-disk SQLite store. The disk store
+    is bounded to max_entries; when it overflows, the least recently used
+    tenth is evicted. Several processes (e.g. OCR pool workers) may share
+    the same directory.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 memory_entries: int = DEFAULT_MEMORY_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "ocr_cache.sqlite3")
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, confidence REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ocr_results_lru ON ocr_results(last_used)")
+        self._db.commit()
+
+    def get(self, key: str):
+        """Returns the cached (text, confidence) for key, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            row = self._db.execute(
+                "SELECT text, confidence FROM ocr_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE ocr_results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            value = (row[0], row[1])
+            self._remember(key, value)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value) -> None:
+        text, confidence = value
+        with self._lock:
+            self._remember(key, (text, float(confidence)))
+            self._db.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, text, confidence, last_used) VALUES (?, ?, ?, ?)",
+                (key, text, float(confidence), time.time()),
+            )
+            self._db.commit()
+            self._writes += 1
+            if self._writes % EVICTION_CHECK_INTERVAL == 0:
+                self._evict()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _remember(self, key: str, value) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        (count,) = self._db.execute("SELECT COUNT(*) FROM ocr_results").fetchone()
+        if count <= self.max_entries:
+            return
+        drop = count - int(self.max_entries * 0.9)
+        self._db.execute(
+            "DELETE FROM ocr_results WHERE key IN "
+            "(SELECT key FROM ocr_results ORDER BY last_used ASC LIMIT ?)",
+            (drop,),
+        )
+        self._db.commit()
+        print(f"[OCR cache] Evicted {drop} least recently used entries", file=sys.stderr)
@@ -0,0 +1,301 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import recognizer as ocr
+from batcher import Histogram
+
+# --- 1. Configuration ---
+# Engine used when neither the exam nor the question type picks one
+DEFAULT_ENGINE = os.getenv("OCR_ENGINE", "easyocr")
+# Per-question-type overrides, e.g. "mcq=tesseract-char,numeric=easyocr,text=trocr"
+ENGINE_BY_TYPE = os.getenv("OCR_ENGINE_BY_TYPE", "")
+
+TROCR_MODEL = os.getenv("TROCR_MODEL", "microsoft/trocr-small-handwritten")
+TROCR_BATCH_SIZE = int(os.getenv("TROCR_BATCH_SIZE", "16"))
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 250, 1000]
+
+
+# --- 2. Engine Interface ---
+class OCREngine:
+    """
+    A recognizer that reads a list of ROI crops in one call.
+
+    Subclasses implement _recognize(crops, specs) and return one
+    (text, confidence) pair per crop; specs holds each crop's (allowlist,
+    decoder) constraint (see recognizer.recognize_crops). recognize() wraps it with per-crop
+    latency accounting: a call over N crops records its wall time / N once
+    per crop, so batched and per-crop engines are directly comparable.
+    Calls and crops are counted separately, so crops / calls is the
+    average batch size.
+    """
+
+    name = ""
+    version = 1
+
+    def __init__(self) -> None:
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.counters = {"calls": 0, "crops": 0}
+        self._counters_lock = threading.Lock()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    @property
+    def cache_name(self) -> str:
+        """Identifies this engine's output in OCR cache keys."""
+        return f"{self.name}-v{self.version}"
+
+    def load(self) -> None:
+        """Loads the model once; safe to call from several threads."""
+        with self._load_lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def recognize(self, crops: list, allowlist: str = ocr.DEFAULT_ALLOWLIST, specs: list = None) -> list:
+        if not crops:
+            return []
+        self.load()
+        specs = [spec or (allowlist, "greedy") for spec in (specs or [None] * len(crops))]
+        start = time.perf_counter()
+        results = self._recognize(crops, specs)
+        per_crop_ms = (time.perf_counter() - start) * 1000 / len(crops)
+        for _ in crops:
+            self.latency_ms.observe(per_crop_ms)
+        with self._counters_lock:
+            self.counters["calls"] += 1
+            self.counters["crops"] += len(crops)
+        return results
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            counters = dict(self.counters)
+        return {"engine": self.name, **counters, "latency_ms_per_crop": self.latency_ms.snapshot()}
+
+    def _load(self) -> None:
+        pass
+
+    def _recognize(self, crops: list, specs: list) -> list:
+        raise NotImplementedError
+
+
+_ENGINE_CLASSES = {}
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def register_engine(cls):
+    """Class decorator that makes an engine selectable by its name."""
+    _ENGINE_CLASSES[cls.name] = cls
+    return cls
+
+
+def available_engines() -> list:
+    return sorted(_ENGINE_CLASSES)
+
+
+def get_engine(name: str) -> OCREngine:
+    """Returns the process-wide instance of a registered engine."""
+    with _engines_lock:
+        if name not in _engines:
+            if name not in _ENGINE_CLASSES:
+                raise ValueError(f"Unknown OCR engine '{name}'. Available: {', '.join(available_engines())}")
+            _engines[name] = _ENGINE_CLASSES[name]()
+        return _engines[name]
+
+
+def engine_stats() -> dict:
+    """Per-crop latency of every engine used in this process."""
+    with _engines_lock:
+        return {name: engine.stats() for name, engine in _engines.items()}
+
+
+def _apply_spec(text: str, spec) -> str:
+    """
+    Enforces an (allowlist, decoder) spec after decoding, for engines that
+    cannot constrain their search: drops disallowed characters and keeps only
+    the first one for "single".
+    """
+    allowlist, decoder = spec
+    if allowlist:
+        allowed = set(allowlist) | set(allowlist.upper()) | {" "}
+        text = "".join(c for c in text if c in allowed).strip()
+    if decoder == "single":
+        text = text.replace(" ", "")[:1]
+    return text
+
+
+# --- 3. Engines ---
+@register_engine
+class EasyOCREngine(OCREngine):
+    """EasyOCR's recognition model, one batched forward pass per call."""
+
+    name = "easyocr"
+
+    @property
+    def cache_name(self) -> str:
+        return ocr.ENGINE_NAME
+
+    def _load(self) -> None:
+        ocr.load_reader()
+
+    def _recognize(self, crops: list, specs: list) -> list:
+        passes = {}
+        results = ocr.recognize_crops(crops, specs=specs, stats=passes)
+        with self._counters_lock:
+            # Model forward passes: one per call, plus the low-contrast retry
+            self.counters["forward_passes"] = self.counters.get("forward_passes", 0) + passes.get("forward_passes", 0)
+        return results
+
+
+@register_engine
+class TrOCREngine(OCREngine):
+    """
+    Hugging Face TrOCR with batched generate() over all crops, instead of
+    the per-ROI pipeline of the old trOcr(not_used).py server.
+    Confidence is the geometric mean of the generated tokens' probabilities.
+    """
+
+    name = "trocr"
+
+    @property
+    def cache_name(self) -> str:
+        return f"{self.name}-v{self.version}-{TROCR_MODEL}"
+
+    def _load(self) -> None:
+        try:
+            from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+        except ImportError as e:
+            raise RuntimeError("The 'trocr' engine needs the optional transformers package "
+                               "(pip install transformers sentencepiece)") from e
+
+        print(f"[OCR engines] Loading TrOCR model ({TROCR_MODEL})...", file=sys.stderr)
+        self.processor = TrOCRProcessor.from_pretrained(TROCR_MODEL)
+        self.model = VisionEncoderDecoderModel.from_pretrained(TROCR_MODEL).eval()
+
+    def _recognize(self, crops: list, specs: list) -> list:
+        import torch
+
+        results = [("", 0.0)] * len(crops)
+        index = [i for i, crop in enumerate(crops) if crop.size]
+        for start in range(0, len(index), TROCR_BATCH_SIZE):
+            chunk = index[start:start + TROCR_BATCH_SIZE]
+            images = [cv2.cvtColor(_to_bgr(crops[i]), cv2.COLOR_BGR2RGB) for i in chunk]
+            pixel_values = self.processor(images=images, return_tensors="pt").pixel_values
+            with torch.no_grad():
+                out = self.model.generate(pixel_values, max_new_tokens=32,
+                                          output_scores=True, return_dict_in_generate=True)
+                token_logprobs = self.model.compute_transition_scores(
+                    out.sequences, out.scores, normalize_logits=True)
+            texts = self.processor.batch_decode(out.sequences, skip_special_tokens=True)
+            for i, text, logprobs in zip(chunk, texts, token_logprobs):
+                confidence = float(torch.exp(logprobs[torch.isfinite(logprobs)].mean())) if len(logprobs) else 0.0
+                results[i] = (_apply_spec(text, specs[i]), confidence)
+        return results
+
+
+class TesseractEngine(OCREngine):
+    """
+    Tesseract through its command-line tool (installed in the Docker image),
+    reading each crop with a fixed page-segmentation mode.
+    """
+
+    psm = 7
+
+    @property
+    def cache_name(self) -> str:
+        return f"{self.name}-v{self.version}-psm{self.psm}"
+
+    def _load(self) -> None:
+        try:
+            subprocess.run([TESSERACT_CMD, "--version"], capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise RuntimeError(f"Tesseract is not available ({TESSERACT_CMD}): {e}")
+
+    def _recognize(self, crops: list, specs: list) -> list:
+        return [self._read_one(crop, spec) if crop.size else ("", 0.0) for crop, spec in zip(crops, specs)]
+
+    def _read_one(self, crop: np.ndarray, spec):
+        ok, png = cv2.imencode(".png", crop)
+        if not ok:
+            return ("", 0.0)
+        allowlist, decoder = spec
+        # A one-character answer is read in single-character mode whatever the engine's default
+        psm = 10 if decoder == "single" else self.psm
+        cmd = [TESSERACT_CMD, "stdin", "stdout", "--psm", str(psm)]
+        if allowlist:
+            cmd += ["-c", f"tessedit_char_whitelist={allowlist}{allowlist.upper()}"]
+        proc = subprocess.run(cmd + ["tsv"], input=png.tobytes(), capture_output=True)
+        if proc.returncode != 0:
+            print(f"[OCR engines] Tesseract failed: {proc.stderr.decode(errors='replace')}", file=sys.stderr)
+            return ("", 0.0)
+
+        # TSV rows: level ... conf text; level 5 rows are words
+        words, confidences = [], []
+        for line in proc.stdout.decode("utf-8", errors="replace").splitlines()[1:]:
+            cols = line.split("\t")
+            if len(cols) == 12 and cols[0] == "5" and cols[11].strip():
+                words.append(cols[11].strip())
+                confidences.append(max(0.0, float(cols[10])) / 100)
+        if not words:
+            return ("", 0.0)
+        return (_apply_spec(" ".join(words), spec), float(np.mean(confidences)))
+
+
+@register_engine
+class TesseractCharEngine(TesseractEngine):
+    """Tesseract PSM 10: the crop holds a single character (MCQ options, digits)."""
+
+    name = "tesseract-char"
+    psm = 10
+
+
+@register_engine
+class TesseractLineEngine(TesseractEngine):
+    """Tesseract PSM 7: the crop holds a single line of text."""
+
+    name = "tesseract-line"
+    psm = 7
+
+
+def _to_bgr(crop: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR) if crop.ndim == 2 else crop
+
+
+# --- 4. Engine Selection ---
+def parse_engine_by_type(spec: str) -> dict:
+    """Parses "mcq=tesseract-char,text=trocr" into a dict."""
+    mapping = {}
+    for part in spec.split(","):
+        if "=" in part:
+            qtype, name = part.split("=", 1)
+            mapping[qtype.strip()] = name.strip()
+    return mapping
+
+
+def select_engines(n_rois: int, exam_engine: str = None, question_types: list = None,
+                   engine_by_type: dict = None) -> list:
+    """
+    Picks an engine name for every ROI. A question type's mapping wins over
+    the exam's engine, which wins over OCR_ENGINE.
+    """
+    default = exam_engine or DEFAULT_ENGINE
+    by_type = parse_engine_by_type(ENGINE_BY_TYPE)
+    by_type.update(engine_by_type or {})
+
+    names = []
+    for i in range(n_rois):
+        qtype = question_types[i] if question_types and i < len(question_types) else None
+        names.append(by_type.get(qtype, default))
+
+    for name in set(names):
+        if name not in _ENGINE_CLASSES:
+            raise ValueError(f"Unknown OCR engine '{name}'. Available: {', '.join(available_engines())}")
+    return names
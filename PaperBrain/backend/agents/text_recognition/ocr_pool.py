@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import answer_types
+import ocr_engines
+import recognizer as ocr
+from ocr_cache import OCRCache
+
+# Per-worker OCR cache (all workers share the same on-disk store)
+_cache = None
+
+# --- 1. Worker Side ---
+def _init_worker(torch_threads: int):
+    """
+    Runs once in every worker: pins torch intra-op threads and warms the reader.
+    """
+    # Must be set before torch is imported so OpenMP picks it up too
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    global _cache
+    if os.getenv("OCR_CACHE", "1") != "0":
+        _cache = OCRCache()
+
+    ocr.load_reader()
+    print(f"[OCR pool] Worker {os.getpid()} ready ({torch_threads} torch thread(s))", file=sys.stderr)
+
+
+def recognize_job(page: np.ndarray, rois: list, debug_prefix: str = "", template_path: str = None,
+                  answer_specs: list = None, cache=None, engine: str = None) -> tuple:
+    """
+    Recognizes one decoded page with the settings from the environment
+    (the same switches as ocr_server.py). engine is the exam's OCR engine,
+    if it names one. Returns (answers, confidences, stats).
+    """
+    stats = {}
+    confidences = []
+    engines = [ocr_engines.get_engine(name) for name in ocr_engines.select_engines(
+        len(rois), engine, question_types=answer_types.question_types(answer_specs))]
+    answers = ocr.recognize_page(page, rois, debug_prefix=debug_prefix, cache=cache, stats=stats,
+                                 template_img=ocr.load_template(template_path),
+                                 skip_blank=os.getenv("OCR_SKIP_BLANK", "1") != "0",
+                                 use_glyph=os.getenv("OCR_GLYPH", "1") != "0",
+                                 roi_engines=[(e.cache_name, e.recognize) for e in engines],
+                                 confidences=confidences, reocr=os.getenv("OCR_REOCR", "1") != "0",
+                                 roi_specs=answer_types.decode_specs(answer_specs))
+    return answers, confidences, stats
+
+
+def _recognize_shared(task) -> tuple:
+    """
+    Attaches to a page held in shared memory and recognizes its ROIs.
+    Returns (answers, confidences, stats) for the page.
+    """
+    shm_name, shape, dtype, rois, debug_prefix, template_path, answer_specs, engine = task
+    # Spawned workers share the parent's resource tracker, and the parent
+    # owns (and unlinks) the block, so the worker only attaches and closes.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        page = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        result = recognize_job(page, rois, debug_prefix, template_path, answer_specs, _cache, engine)
+        del page  # release the buffer export before closing the mapping
+        return result
+    finally:
+        shm.close()
+
+
+# --- 2. Pool ---
+class OCRPool:
+    """
+    N worker processes, each holding a warm EasyOCR reader.
+
+    Pages are handed over through multiprocessing.shared_memory so the
+    workers read the decoded pixels directly instead of unpickling copies.
+    """
+
+    def __init__(self, workers: int = None, torch_threads: int = None) -> None:
+        cores = os.cpu_count() or 1
+        self.workers = max(1, min(workers or cores, cores))
+        # N workers x threads should match the core count
+        self.torch_threads = torch_threads or max(1, cores // self.workers)
+
+        # Train/save the glyph model once here so workers only load it
+        if os.getenv("OCR_GLYPH", "1") != "0":
+            from glyph_classifier import load_classifier
+            load_classifier()
+
+        # torch is not fork-safe once initialised, so always spawn fresh workers
+        ctx = multiprocessing.get_context("spawn")
+        self._pool = ctx.Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(self.torch_threads,),
+        )
+
+    def recognize_pages(self, pages: list) -> list:
+        """
+        Recognizes a list of (page, rois, debug_prefix, template_path, answer_specs, engine)
+        jobs; answer_specs and engine may be None (see answer_types.py, ocr_engines.py).
+        Returns one (answers, confidences, stats) tuple per page, in input order.
+        """
+        blocks = []
+        tasks = []
+        try:
+            for page, rois, debug_prefix, template_path, answer_specs, engine in pages:
+                page = np.ascontiguousarray(page)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, page.nbytes))
+                blocks.append(shm)
+                np.ndarray(page.shape, dtype=page.dtype, buffer=shm.buf)[...] = page
+                tasks.append((shm.name, page.shape, page.dtype.str, rois, debug_prefix, template_path,
+                              answer_specs, engine))
+
+            # Pool.map keeps results in input order
+            return self._pool.map(_recognize_shared, tasks, chunksize=1)
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,7 +1,4 @@
 import asyncio
-import base64
-import cv2
-import numpy as np
 import sys
 import json
 import os
@@ -19,23 +16,49 @@ from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
 
+import recognizer as ocr
+from batcher import MicroBatcher
+from ocr_cache import OCRCache
+import ocr_engines
+import answer_types
+
 # Initialize EasyOCR Reader once
 reader = None
 if OCR_AVAILABLE:
     try:
         print("Initializing EasyOCR reader...", file=sys.stderr)
-        # Suppress stdout from easyocr
-        original_stdout = sys.stdout
-        sys.stdout = sys.stderr
-        try:
-            reader = easyocr.Reader(['en'], gpu=False, verbose=False)
-        finally:
-            sys.stdout = original_stdout # Restore stdout
+        reader = ocr.load_reader()
         print("EasyOCR ready!", file=sys.stderr)
     except Exception as e:
         print(f"Failed to initialize EasyOCR: {e}", file=sys.stderr)
         OCR_AVAILABLE = False
 
+# Cross-sheet micro-batching in front of the recognizer: crops from every
+# in-flight tool call are pooled into one forward pass.
+batcher = None
+if OCR_AVAILABLE:
+    batcher = MicroBatcher(
+        ocr_engines.get_engine("easyocr").recognize,
+        max_batch_size=int(os.getenv("OCR_MAX_BATCH", "32")),
+        max_wait_ms=float(os.getenv("OCR_MAX_WAIT_MS", "20")),
+    )
+
+# Skip the recognizer for ROIs with no ink (set OCR_SKIP_BLANK=0 to disable)
+SKIP_BLANK = os.getenv("OCR_SKIP_BLANK", "1") != "0"
+
+# Answer single letters/digits with the glyph classifier before EasyOCR
+# (set OCR_GLYPH=0 to send every crop to EasyOCR)
+USE_GLYPH = os.getenv("OCR_GLYPH", "1") != "0"
+if USE_GLYPH:
+    from glyph_classifier import load_classifier
+    load_classifier()
+
+# Re-read low-confidence ROIs with other crops / engines (set OCR_REOCR=0 to disable)
+REOCR = os.getenv("OCR_REOCR", "1") != "0"
+
+# Content-hash cache of recognizer results (set OCR_CACHE=0 to disable)
+ocr_cache = OCRCache() if os.getenv("OCR_CACHE", "1") != "0" else None
+
 # This is the ONLY 'app' definition
 app = Server("easyocr-server")
 
@@ -43,68 +66,121 @@ app = Server("easyocr-server")
 os.makedirs("debug_crops", exist_ok=True)
 
 
+def resolve_engines(n_rois: int, exam_engine: str = None, question_types: list = None,
+                    engine_by_type: dict = None) -> list:
+    """
+    Maps every ROI to an (engine_name, engine) pair for recognize_page.
+    EasyOCR ROIs go through the cross-sheet batcher; other engines are called directly.
+    """
+    routes = []
+    for name in ocr_engines.select_engines(n_rois, exam_engine, question_types, engine_by_type):
+        engine = ocr_engines.get_engine(name)
+        routes.append((engine.cache_name, batcher.recognize if name == "easyocr" else engine.recognize))
+    return routes
+
+
 # --- 2. The Recognition Function (EasyOCR Version) ---
-# *** CHANGED PADDING FROM 10 to 5 ***
-# This should help fix the "ca" error by not grabbing the box line.
-def recognize_from_rois_easyocr(image_base64: str, rois: list, padding: int = 20) -> list:
+# Cropping and recognition live in recognizer.py so the OCR pool workers
+# (ocr_pool.py) read ROIs exactly the same way as this server.
+def recognize_from_rois_easyocr(image_base64: str, rois: list, padding: int = ocr.DEFAULT_PADDING,
+                                stats: dict = None, template_path: str = None, engine: str = None,
+                                question_types: list = None, engine_by_type: dict = None,
+                                confidences: list = None, answer_specs: list = None) -> list:
     """
-    Crops and recognizes text from ROIs using EasyOCR.
+    Crops and recognizes text from ROIs using EasyOCR, or the engine chosen
+    for the exam / question type (see ocr_engines.select_engines).
+    Blank-skip and cache hit/miss counts are added to stats, and one
+    confidence per ROI to confidences, when given. answer_specs (one
+    {"type", "allowlist", "decoder"} or None per ROI) constrains decoding
+    and supplies the question types when none are given.
     """
     if not OCR_AVAILABLE or reader is None:
         raise RuntimeError("EasyOCR is not available or failed to initialize.")
         
     try:
-        nparr = np.frombuffer(base64.b64decode(image_base64), np.uint8)
-        # Load as a 3-channel COLOR image, which easyocr prefers
-        color_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if color_img is None: raise ValueError("Could not decode image")
-            
-        (img_h, img_w) = color_img.shape[:2]
-        recognized_answers = []
-
-        for i, box in enumerate(rois):
-            x, y, w, h = box
-            
-            # Apply padding
-            y_start = max(0, y - padding)
-            y_end = min(img_h, y + h + padding)
-            x_start = max(0, x - padding)
-            x_end = min(img_w, x + w + padding)
-            
-            # Crop the padded region from the COLOR image
-            padded_crop = color_img[y_start:y_end, x_start:x_end]
-            
-            # --- Save debug image ---
-            crop_filename = f"debug_crops/roi_{i+1}.png"
-            cv2.imwrite(crop_filename, padded_crop)
-            
-            # --- Call EasyOCR ---
-            # We give it the raw color crop
-            result = reader.readtext(
-                padded_crop, 
-                detail=0,
-                allowlist='abc023456789' # *** REMOVED REDUNDANT UPPERCASE ***
-            )
-            
-            if result:
-                # result is like ['b'], so we take the first item
-                answer = result[0].lower().strip()
-                recognized_answers.append(answer)
-                print(f"  ROI {i+1}: Found '{answer}'", file=sys.stderr)
-            else:
-                # No text found
-                recognized_answers.append("") # Append empty string
-                print(f"  ROI {i+1}: Found no text", file=sys.stderr)
-                
-        return recognized_answers
+        color_img = ocr.decode_image(image_base64)
+        question_types = question_types or answer_types.question_types(answer_specs)
+        return ocr.recognize_page(color_img, rois, padding, engine=batcher.recognize,
+                                  cache=ocr_cache, stats=stats,
+                                  template_img=ocr.load_template(template_path),
+                                  skip_blank=SKIP_BLANK, use_glyph=USE_GLYPH,
+                                  roi_engines=resolve_engines(len(rois), engine, question_types, engine_by_type),
+                                  confidences=confidences, reocr=REOCR,
+                                  roi_specs=answer_types.decode_specs(answer_specs))
         
     except Exception as e:
         print(f"EasyOCR processing failed: {e}", file=sys.stderr)
         raise ValueError(f"EasyOCR processing failed: {str(e)}")
 
 
+# Sheets recognized at the same time across all tool calls; their crops
+# meet in the micro-batcher, so this bounds memory rather than throughput.
+SHEET_CONCURRENCY = int(os.getenv("OCR_SHEET_CONCURRENCY", "8"))
+_sheet_slots = asyncio.Semaphore(SHEET_CONCURRENCY)
+
+
+async def recognize_sheet(sheet: dict) -> dict:
+    """
+    Recognizes one sheet off the event loop, so the server keeps serving
+    other calls (and their crops can join the same recognizer batch).
+    Returns {"answers", "confidences", "stats"} keyed by "Q1", "Q2", ...
+    """
+    stats = {}
+    confidences = []
+    async with _sheet_slots:
+        recognized_list = await asyncio.to_thread(recognize_from_rois_easyocr, sheet["image_base64"],
+                                                  sheet["rois"], ocr.DEFAULT_PADDING, stats,
+                                                  sheet.get("template_path"),
+                                                  sheet.get("engine"),
+                                                  sheet.get("question_types"),
+                                                  sheet.get("engine_by_type"),
+                                                  confidences,
+                                                  sheet.get("answer_specs"))
+    return {
+        "answers": {f"Q{i+1}": answer for i, answer in enumerate(recognized_list)},
+        "confidences": {f"Q{i+1}": c for i, c in enumerate(confidences)},
+        "stats": stats,
+    }
+
+
+async def report_progress(progress: float, total: float, message: str) -> None:
+    """Sends an MCP progress notification if the caller asked for progress."""
+    ctx = app.request_context
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return
+    await ctx.session.send_progress_notification(token, progress, total, message,
+                                                 related_request_id=str(ctx.request_id))
+
+
 # --- 3. The Tool Definition and Caller (Unchanged) ---
+# One answer sheet: read_text_in_rois takes it directly, read_text_in_sheets a list of them
+SHEET_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "image_base64": {"type": "string"},
+        "rois": {"type": "array", "items": { "type": "array", "items": { "type": "integer" } }},
+        "template_path": {"type": "string", "description": "Optional blank template, subtracted before the blank-answer check."},
+        "engine": {"type": "string", "description": f"OCR engine for this exam: {', '.join(ocr_engines.available_engines())}."},
+        "question_types": {"type": "array", "items": {"type": "string"}, "description": "Optional question type per ROI (e.g. mcq, numeric, text)."},
+        "engine_by_type": {"type": "object", "additionalProperties": {"type": "string"}, "description": "Optional engine per question type, e.g. {\"mcq\": \"tesseract-char\"}."},
+        "answer_specs": {
+            "type": "array",
+            "description": "Optional answer constraint per ROI (see answer_types.py).",
+            "items": {
+                "type": ["object", "null"],
+                "properties": {
+                    "type": {"type": "string"},
+                    "allowlist": {"type": ["string", "null"]},
+                    "decoder": {"type": "string", "enum": list(ocr.DECODERS)}
+                }
+            }
+        }
+    },
+    "required": ["image_base64", "rois"]
+}
+
+
 @app.list_tools()
 async def list_tools() -> list[Tool]:
     """List available tools"""
@@ -112,14 +188,37 @@ async def list_tools() -> list[Tool]:
         Tool(
             name="read_text_in_rois",
             description="Reads text from a list of specific regions (ROIs) of a base64 image.",
+            inputSchema=SHEET_SCHEMA
+        ),
+        Tool(
+            name="read_text_in_sheets",
+            description="Reads many answer sheets in one call. Sheets are recognized concurrently "
+                        "(their crops share recognizer batches) and a progress notification is sent "
+                        "as each sheet finishes.",
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "image_base64": {"type": "string"},
-                    "rois": {"type": "array", "items": { "type": "array", "items": { "type": "integer" } }}
+                    "sheets": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": dict(SHEET_SCHEMA["properties"], id={"type": "string"}),
+                            "required": SHEET_SCHEMA["required"]
+                        }
+                    }
                 },
-                "required": ["image_base64", "rois"]
+                "required": ["sheets"]
             }
+        ),
+        Tool(
+            name="get_batching_stats",
+            description="Returns the recognizer's batch-size and queue-wait histograms.",
+            inputSchema={"type": "object", "properties": {}}
+        ),
+        Tool(
+            name="get_engine_stats",
+            description="Returns the per-crop latency histogram of every OCR engine used so far.",
+            inputSchema={"type": "object", "properties": {}}
         )
     ]
 
@@ -128,27 +227,15 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls"""
     if name == "read_text_in_rois":
         try:
-            image_data = arguments["image_base64"]
-            rois = arguments["rois"]
-            
-            print(f"--- Tool 'read_text_in_rois' (EasyOCR Model) called with {len(rois)} ROIs ---", file=sys.stderr)
-            
-            recognized_list = recognize_from_rois_easyocr(image_data, rois)
-            
-            # --- *** START CHANGE *** ---
-            # Convert the list of answers into the desired dictionary format
-            answers_dict = {}
-            for i, answer in enumerate(recognized_list):
-                # Format as "Q1", "Q2", etc.
-                answers_dict[f"Q{i+1}"] = answer
-                
-            # Now, the output JSON will be {"Q1": "c", "Q2": "6", ...}
-            output_json = json.dumps(answers_dict)
-            # --- *** END CHANGE *** ---
+            print(f"--- Tool 'read_text_in_rois' (EasyOCR Model) called with {len(arguments['rois'])} ROIs ---", file=sys.stderr)
+            result = await recognize_sheet(arguments)
 
+            # Answers as {"Q1": "c", "Q2": "6", ...}
             return [
-                TextContent(type="text", text=f"Successfully processed {len(rois)} regions."),
-                TextContent(type="text", text=output_json) # This now contains the new JSON
+                TextContent(type="text", text=f"Successfully processed {len(arguments['rois'])} regions."),
+                TextContent(type="text", text=json.dumps(result["answers"])),
+                TextContent(type="text", text=f"OCR stats: {json.dumps(result['stats'])}"),
+                TextContent(type="text", text=f"OCR confidences: {json.dumps(result['confidences'])}")
             ]
         except Exception as e:
             return [
@@ -157,7 +244,36 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
                     text=f"Error recognizing text: {str(e)}"
                 )
             ]
-    
+
+    if name == "read_text_in_sheets":
+        sheets = arguments["sheets"]
+        print(f"--- Tool 'read_text_in_sheets' called with {len(sheets)} sheets ---", file=sys.stderr)
+
+        async def run(index, sheet):
+            sheet_id = sheet.get("id", str(index))
+            try:
+                return index, dict(await recognize_sheet(sheet), id=sheet_id)
+            except Exception as e:
+                return index, {"id": sheet_id, "error": str(e)}
+
+        # All sheets run at once (bounded by SHEET_CONCURRENCY); report each as it finishes
+        results = [None] * len(sheets)
+        tasks = [asyncio.ensure_future(run(i, sheet)) for i, sheet in enumerate(sheets)]
+        for done, task in enumerate(asyncio.as_completed(tasks), 1):
+            index, result = await task
+            results[index] = result
+            status = "failed" if "error" in result else "done"
+            await report_progress(done, len(sheets), f"Sheet {result['id']} {status}")
+
+        return [TextContent(type="text", text=json.dumps({"sheets": results}))]
+
+    if name == "get_batching_stats":
+        stats = batcher.stats() if batcher else {}
+        return [TextContent(type="text", text=json.dumps(stats))]
+
+    if name == "get_engine_stats":
+        return [TextContent(type="text", text=json.dumps(ocr_engines.engine_stats()))]
+
     raise ValueError(f"Unknown tool: {name}")
 
 async def main():
@@ -0,0 +1,97 @@
+import math
+
+import cv2
+import numpy as np
+
+# --- 1. Configuration ---
+MODEL_HEIGHT = 64          # easyocr.config.imgH for the gen2 recognizer
+CONTRAST_TARGET = 0.4      # easyocr's adjust_contrast_grey default target
+
+
+def to_grey(img: np.ndarray) -> np.ndarray:
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def crop_page_rois(page: np.ndarray, rois: list, padding: int) -> list:
+    """
+    Converts the page to grayscale once and returns a grey view per padded
+    ROI (no per-crop copies or colour conversions).
+    """
+    from recognizer import crop_roi
+
+    grey = to_grey(page)
+    return [crop_roi(grey, box, padding) for box in rois]
+
+
+# --- 2. Batch Builder ---
+def batch_width(crops: list, model_height: int = MODEL_HEIGHT) -> int:
+    """
+    Common input width for a batch, rounded up to a multiple of the model
+    height (as easyocr sizes its batches), so similar batches share a shape.
+    """
+    width = model_height
+    for crop in crops:
+        h, w = crop.shape[:2]
+        if crop.size:
+            width = max(width, math.ceil(w / h) * model_height)
+    return int(width)
+
+
+def prepare_batch(crops: list, model_height: int = MODEL_HEIGHT, width: int = None,
+                  adjust_contrast: float = 0.0) -> np.ndarray:
+    """
+    Turns grey (or BGR) crops into one ready-to-infer float32 batch of shape
+    (N, 1, model_height, width), matching easyocr's AlignCollate/NormalizePAD:
+
+      1. aspect-preserving resize to the model height (one resize per crop)
+      2. optional contrast stretch for low-contrast crops (adjust_contrast > 0)
+      3. right-padding by repeating each crop's last column
+      4. scaling to [-1, 1]
+
+    Steps 2-4 run on the whole batch at once.
+    """
+    n = len(crops)
+    width = width or batch_width(crops, model_height)
+    pixels = np.zeros((n, model_height, width), np.uint8)
+    widths = np.ones(n, np.int64)
+
+    for k, crop in enumerate(crops):
+        if crop.size == 0:
+            continue
+        grey = to_grey(crop)
+        h, w = grey.shape[:2]
+        ratio = w / h
+        target_w = int(model_height * ratio) if ratio >= 1.0 else math.ceil(model_height * ratio)
+        target_w = max(1, min(width, target_w))
+        # Bilinear, as easyocr's compute_ratio_and_resize effectively uses
+        pixels[k, :, :target_w] = cv2.resize(grey, (target_w, model_height), interpolation=cv2.INTER_LINEAR)
+        widths[k] = target_w
+
+    values = pixels.astype(np.float32)
+    if adjust_contrast > 0 and n:
+        _stretch_contrast(values, widths, adjust_contrast)
+
+    # Right-pad by repeating each crop's last valid column
+    columns = np.minimum(np.arange(width)[None, :], widths[:, None] - 1)
+    values = np.take_along_axis(values, np.broadcast_to(columns[:, None, :], values.shape), axis=2)
+
+    values *= 1 / 127.5
+    values -= 1.0
+    return values[:, None]
+
+
+def _stretch_contrast(values: np.ndarray, widths: np.ndarray, target: float) -> None:
+    """
+    easyocr's adjust_contrast_grey, batched: crops whose 10th-90th percentile
+    contrast is below target are stretched in place.
+    """
+    lows = np.empty(len(values), np.float32)
+    highs = np.empty(len(values), np.float32)
+    for k, w in enumerate(widths):
+        lows[k], highs[k] = np.percentile(values[k, :, :w], (10, 90))
+    contrast = (highs - lows) / np.maximum(10, highs + lows)
+    stretch = contrast < target
+    if not stretch.any():
+        return
+    ratio = (200.0 / np.maximum(10, highs - lows))[stretch, None, None]
+    values[stretch] = np.floor(np.clip((values[stretch] - lows[stretch, None, None] + 25) * ratio, 0, 255))
@@ -0,0 +1,379 @@
+import base64
+import functools
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# --- 1. Configuration ---
+DEFAULT_PADDING = 20
+DEFAULT_ALLOWLIST = 'abc023456789'
+DEBUG_CROPS_DIR = "debug_crops"
+
+# Recognizer mode:
+#   "float"       - stock fp32 recognition model
+#   "quantized"   - dynamic int8 Linear/LSTM layers (easyocr's CPU default)
+#   "torchscript" - quantized + traced, cached on disk (see model_export.py)
+RECOGNIZER_MODE = os.getenv("OCR_RECOGNIZER_MODE", "quantized")
+# Identifies recognize_crops() in OCR cache keys; bump when its output can change
+ENGINE_NAME = f"easyocr-recognizer-v2-{RECOGNIZER_MODE}"
+# A single-character ("single" decoder) reading below this probability is answered ""
+SINGLE_MIN_CONFIDENCE = float(os.getenv("OCR_SINGLE_MIN_CONFIDENCE", "0.5"))
+
+# One EasyOCR reader per process (the MCP server or an OCR pool worker)
+_reader = None
+
+
+def build_reader(mode: str = RECOGNIZER_MODE):
+    """
+    Builds an EasyOCR reader for the given recognizer mode. Only the
+    recognition model is loaded: ROIs are already located by the region
+    selector, so the CRAFT text detector is never used. Weights come from
+    the offline model bundle (see model_bundle.py).
+    """
+    import model_bundle
+
+    # Suppress stdout from easyocr (stdout is the MCP transport)
+    original_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        if mode == "torchscript":
+            from model_export import load_torchscript_reader
+            return load_torchscript_reader()
+        if mode not in ("float", "quantized"):
+            raise ValueError(f"Unknown OCR_RECOGNIZER_MODE: {mode}")
+        return model_bundle.load_reader(quantize=(mode == "quantized"))
+    finally:
+        sys.stdout = original_stdout  # Restore stdout
+
+
+def load_reader():
+    """
+    Loads the EasyOCR reader on first use and keeps it warm for this process.
+    """
+    global _reader
+    if _reader is None:
+        _reader = build_reader()
+    return _reader
+
+
+# --- 2. Image Helpers ---
+def decode_image(image_base64: str) -> np.ndarray:
+    """
+    Decodes a base64 page into a 3-channel COLOR image, which easyocr prefers.
+    """
+    nparr = np.frombuffer(base64.b64decode(image_base64), np.uint8)
+    color_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if color_img is None:
+        raise ValueError("Could not decode image")
+    return color_img
+
+
+@functools.lru_cache(maxsize=8)
+def load_template(template_path: str):
+    """
+    Loads the blank question-paper template (printed layout only), or None.
+    """
+    if not template_path or not os.path.isfile(template_path):
+        return None
+    return cv2.imread(template_path, cv2.IMREAD_COLOR)
+
+
+def crop_roi(img: np.ndarray, box, padding: int = DEFAULT_PADDING) -> np.ndarray:
+    """
+    Returns the padded crop of one ROI, clipped to the page bounds.
+    """
+    img_h, img_w = img.shape[:2]
+    x, y, w, h = box
+    y_start = max(0, y - padding)
+    y_end = min(img_h, y + h + padding)
+    x_start = max(0, x - padding)
+    x_end = min(img_w, x + w + padding)
+    return img[y_start:y_end, x_start:x_end]
+
+
+# --- 3. Batched Recognition ---
+# Decoding modes for a crop's spec:
+#   "greedy"     - best class per time step (EasyOCR's default)
+#   "single"     - exactly one character: the allowed class with the highest
+#                  probability anywhere in the line (MCQ options)
+#   "beamsearch" - CTC beam search, for free text
+#   "paragraph"  - long answers: recognize_page splits the ROI into text
+#                  lines (line_segmentation.py) and beam-searches each line
+DECODERS = ("greedy", "single", "beamsearch", "paragraph")
+BEAM_WIDTH = 5
+# Crops read below this confidence are re-read once with contrast adjusted,
+# as easyocr's get_text does
+CONTRAST_THS = 0.1
+ADJUST_CONTRAST = 0.5
+
+
+def _confidence(probs: np.ndarray) -> float:
+    """EasyOCR's line confidence: geometric-style mean of non-blank step maxima."""
+    best = probs.argmax(axis=1)
+    max_probs = probs.max(axis=1)[best != 0]
+    if len(max_probs) == 0:
+        return 0.0
+    return float(max_probs.prod() ** (2.0 / np.sqrt(len(max_probs))))
+
+
+def predict_batch(reader, batch: np.ndarray, specs: list) -> list:
+    """
+    One forward pass over a prepared batch (see preprocess.prepare_batch),
+    then per-image decoding restricted to that image's allowlist.
+    Returns one (text, confidence) per image.
+    """
+    import torch
+    import torch.nn.functional as F
+
+    images = torch.from_numpy(batch).to(reader.device)
+    text_for_pred = torch.zeros(len(batch), int(batch.shape[3] / 10) + 1, dtype=torch.long).to(reader.device)
+    with torch.no_grad():
+        probs = F.softmax(reader.recognizer(images, text_for_pred), dim=2)
+    probs = probs.cpu().numpy()
+
+    # Zero every class outside each crop's allowlist (class 0 is the CTC blank)
+    n, _, n_classes = probs.shape
+    allowed = np.ones((n, n_classes), bool)
+    for k, (allowlist, _) in enumerate(specs):
+        if allowlist:
+            allowed[k, 1:] = [c in allowlist for c in reader.character]
+    probs = probs * allowed[:, None, :]
+    probs /= np.maximum(probs.sum(axis=2, keepdims=True), 1e-12)
+
+    converter = reader.converter
+    results = [None] * n
+    greedy = [k for k, (_, decoder) in enumerate(specs) if decoder not in ("single", "beamsearch")]
+    if greedy:
+        best = probs[greedy].argmax(axis=2)
+        texts = converter.decode_greedy(best.reshape(-1), [best.shape[1]] * len(greedy))
+        for k, text in zip(greedy, texts):
+            results[k] = (text, _confidence(probs[k]))
+
+    for k, (allowlist, decoder) in enumerate(specs):
+        if decoder == "single":
+            # An empty box must stay empty rather than become the likeliest option
+            char_probs = probs[k, :, 1:].max(axis=0)
+            best = int(char_probs.argmax())
+            if not probs[k].argmax(axis=1).any() or char_probs[best] < SINGLE_MIN_CONFIDENCE:
+                results[k] = ("", 0.0)
+            else:
+                results[k] = (reader.character[best], float(char_probs[best]))
+        elif decoder == "beamsearch":
+            text = converter.decode_beamsearch(probs[k:k + 1], beamWidth=BEAM_WIDTH)[0]
+            results[k] = (text, _confidence(probs[k]))
+    return results
+
+
+def recognize_crops(crops: list, allowlist: str = DEFAULT_ALLOWLIST, reader=None, specs: list = None,
+                    stats: dict = None) -> list:
+    """
+    Runs EasyOCR's recognizer (no text detector) over many crops in one
+    batched forward pass. specs optionally gives each crop its own
+    (allowlist, decoder) constraint; allowlist None means the full charset.
+    Crops without a spec use (allowlist, "greedy"). When stats is a dict,
+    each predict_batch call adds one to stats["forward_passes"].
+    Returns one (text, confidence) pair per crop, in order.
+    """
+    from preprocess import batch_width, prepare_batch
+
+    reader = reader or load_reader()
+    results = [("", 0.0)] * len(crops)
+    specs = [spec or (allowlist, "greedy") for spec in (specs or [None] * len(crops))]
+
+    # Remember which crop each batch row came from
+    index = [i for i, crop in enumerate(crops) if crop.size]
+    if not index:
+        return results
+
+    images = [crops[i] for i in index]
+    item_specs = [specs[i] for i in index]
+    width = batch_width(images)
+    first = predict_batch(reader, prepare_batch(images, width=width), item_specs)
+    passes = 1
+
+    # Second round with contrast adjustment for the least confident readings
+    low = [k for k, (_, confidence) in enumerate(first) if confidence < CONTRAST_THS]
+    if low:
+        second = predict_batch(reader, prepare_batch([images[k] for k in low], width=width,
+                                                adjust_contrast=ADJUST_CONTRAST),
+                          [item_specs[k] for k in low])
+        passes += 1
+        for k, reading in zip(low, second):
+            if reading[1] >= first[k][1]:
+                first[k] = reading
+
+    for i, reading in zip(index, first):
+        results[i] = reading
+    if stats is not None:
+        stats["forward_passes"] = stats.get("forward_passes", 0) + passes
+    return results
+
+
+# --- 4. Page Recognition ---
+def spec_key(spec) -> str:
+    """Stable text form of an (allowlist, decoder) spec, for cache keys."""
+    allowlist, decoder = spec
+    return f"{allowlist or '*'}:{decoder}"
+
+
+def recognize_page(color_img: np.ndarray, rois: list, padding: int = DEFAULT_PADDING,
+                   debug_prefix: str = "", engine=None, engine_name: str = ENGINE_NAME,
+                   cache=None, stats: dict = None, template_img: np.ndarray = None,
+                   skip_blank: bool = True, use_glyph: bool = True, roi_engines: list = None,
+                   confidences: list = None, reocr: bool = True, roi_specs: list = None) -> list:
+    """
+    Crops every ROI of an aligned page and recognizes all of them in one call
+    to engine (recognize_crops by default; the MCP server passes its batcher).
+    roi_engines optionally routes ROIs to other engines: one (engine_name,
+    engine) pair or None per ROI, with one engine call per distinct engine.
+    Engine readings below reocr.MIN_CONFIDENCE get a second pass over
+    alternative crops (see reocr.py) when reocr is set.
+    When confidences is a list, one confidence per ROI is appended to it.
+    roi_specs optionally constrains each ROI's decoding: one (allowlist,
+    decoder) pair or None per ROI (see answer_types.py).
+    Crops with too little ink (after subtracting template_img, when given) are
+    answered "" without the recognizer, crops already in the OCR cache skip
+    the engine entirely, and confident single-glyph crops are answered by the
+    lightweight glyph classifier.
+    Returns one lower-cased answer per ROI, in ROI order ("" when nothing was read).
+    """
+    from blank_filter import find_blank
+    from glyph_classifier import GLYPH_CLASSES, load_classifier
+    from line_segmentation import segment_lines
+    from ocr_cache import crop_key
+    from preprocess import crop_page_rois
+    from reocr import reocr_low_confidence
+
+    engine = engine or recognize_crops
+    routes = [(roi_engines[i] if roi_engines and roi_engines[i] else (engine_name, engine))
+              for i in range(len(rois))]
+    # Cached results depend on every stage that can produce them
+    if use_glyph:
+        routes = [(f"{name}+glyph", fn) for name, fn in routes]
+    if reocr:
+        routes = [(f"{name}+reocr", fn) for name, fn in routes]
+    specs = [(roi_specs[i] if roi_specs and roi_specs[i] else (DEFAULT_ALLOWLIST, "greedy"))
+             for i in range(len(rois))]
+
+    stats = stats if stats is not None else {}
+    os.makedirs(DEBUG_CROPS_DIR, exist_ok=True)
+
+    # Grayscale the page once; every stage below works on grey views
+    crops = crop_page_rois(color_img, rois, padding)
+    for i, box in enumerate(rois):
+        # --- Save debug image ---
+        crop_filename = os.path.join(DEBUG_CROPS_DIR, f"{debug_prefix}roi_{i+1}.png")
+        cv2.imwrite(crop_filename, crop_roi(color_img, box, padding))
+
+    results = [None] * len(crops)
+    keys = [None] * len(crops)
+    template_crops = None
+    if template_img is not None and template_img.shape[:2] == color_img.shape[:2]:
+        template_crops = [crop_roi(template_img, box, padding) for box in rois]
+
+    # --- Blank-answer fast path (ink density) ---
+    if skip_blank and crops:
+        blank = find_blank(crops, template_crops)
+        for i in np.flatnonzero(blank):
+            results[i] = ("", 1.0)
+        stats["blank_skipped"] = stats.get("blank_skipped", 0) + int(blank.sum())
+
+    # --- Check the OCR cache next ---
+    pending = []
+    for i, crop in enumerate(crops):
+        if results[i] is not None:
+            continue
+        if cache is not None:
+            keys[i] = crop_key(crop, routes[i][0], spec_key(specs[i]), padding)
+            results[i] = cache.get(keys[i])
+        if results[i] is None:
+            pending.append(i)
+
+    if cache is not None:
+        looked_up = sum(1 for k in keys if k is not None)
+        stats["cache_hits"] = stats.get("cache_hits", 0) + looked_up - len(pending)
+        stats["cache_misses"] = stats.get("cache_misses", 0) + len(pending)
+
+    paragraphs = {i for i in pending if specs[i][1] == "paragraph"}
+
+    # --- Single-glyph classifier first pass (not for long answers) ---
+    # The classifier is closed-set: it always answers with one of its classes,
+    # so it only sees ROIs whose allowed characters are all among them.
+    glyph_candidates = [i for i in pending if use_glyph and i not in paragraphs
+                        and specs[i][0] and set(specs[i][0]) <= set(GLYPH_CLASSES)]
+    if glyph_candidates:
+        classifier = load_classifier(GLYPH_CLASSES)
+        glyph_results = classifier.classify(
+            [crops[i] for i in glyph_candidates],
+            [template_crops[i] for i in glyph_candidates] if template_crops else None,
+            allowlists=[specs[i][0] for i in glyph_candidates],
+        )
+        accepted = set()
+        for i, result in zip(glyph_candidates, glyph_results):
+            if result is None:
+                continue
+            results[i] = result
+            accepted.add(i)
+            if cache is not None:
+                cache.put(keys[i], result)
+        stats["glyph_accepted"] = stats.get("glyph_accepted", 0) + len(accepted)
+        pending = [i for i in pending if i not in accepted]
+
+    # --- Recognize the rest in one call per engine ---
+    # Long answers are split into text lines, and their lines join the same
+    # engine call as every other pending crop.
+    by_engine = {}
+    for i in pending:
+        jobs = by_engine.setdefault(routes[i][0], [])
+        if i in paragraphs:
+            template_crop = template_crops[i] if template_crops else None
+            lines = segment_lines(crops[i], template_crop)
+            jobs += [(i, crops[i][y0:y1], (specs[i][0], "beamsearch")) for y0, y1 in lines]
+            stats["paragraph_lines"] = stats.get("paragraph_lines", 0) + len(lines)
+        else:
+            jobs.append((i, crops[i], specs[i]))
+
+    readings = {i: [] for i in pending}
+    for jobs in by_engine.values():
+        fresh = routes[jobs[0][0]][1]([crop for _, crop, _ in jobs], specs=[spec for _, _, spec in jobs])
+        for (i, _, _), result in zip(jobs, fresh):
+            readings[i].append(result)
+    for i in pending:
+        lines = [(text.strip(), confidence) for text, confidence in readings[i] if text.strip()]
+        if i not in paragraphs:
+            results[i] = readings[i][0] if readings[i] else ("", 0.0)
+        elif lines:
+            # Lines in reading order; confidence is the mean over non-empty lines
+            results[i] = (" ".join(text for text, _ in lines), float(np.mean([c for _, c in lines])))
+        else:
+            results[i] = ("", 0.0)
+    if pending:
+        # One engine invocation per distinct engine; the ROIs they read are counted separately
+        stats["engine_calls"] = stats.get("engine_calls", 0) + len(by_engine)
+        stats["engine_rois"] = stats.get("engine_rois", 0) + len(pending)
+
+    # --- Second pass on low-confidence readings only (single-line ROIs) ---
+    if reocr and pending:
+        reocr_low_confidence(color_img, rois, [i for i in pending if i not in paragraphs], results, routes,
+                             padding, specs=specs, stats=stats)
+
+    # Cache the final (possibly re-read) results
+    if cache is not None:
+        for i in pending:
+            cache.put(keys[i], results[i])
+
+    stats["rois"] = stats.get("rois", 0) + len(crops)
+    recognized_answers = []
+    for i, (text, confidence) in enumerate(results):
+        answer = text.lower().strip()
+        recognized_answers.append(answer)
+        if confidences is not None:
+            confidences.append(round(float(confidence), 4))
+        if answer:
+            print(f"  ROI {i+1}: Found '{answer}' ({confidence:.2f})", file=sys.stderr)
+        else:
+            print(f"  ROI {i+1}: Found no text", file=sys.stderr)
+
+    return recognized_answers
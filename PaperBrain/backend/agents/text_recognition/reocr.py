@@ -0,0 +1,88 @@
+import os
+
+import cv2
+import numpy as np
+
+from recognizer import crop_roi
+
+# --- 1. Configuration ---
+# Readings below this confidence get a second, more expensive pass
+MIN_CONFIDENCE = float(os.getenv("OCR_REOCR_MIN_CONFIDENCE", "0.5"))
+# Alternative paddings tried around the ROI box
+ALT_PADDINGS = [int(p) for p in os.getenv("OCR_REOCR_PADDINGS", "8,35").split(",") if p.strip()]
+UPSCALE = 2.0
+# Optional second engine (see ocr_engines.py) that also reads the original crop
+SECONDARY_ENGINE = os.getenv("OCR_REOCR_ENGINE", "")
+
+
+# --- 2. Crop Variants ---
+def binarize(crop: np.ndarray) -> np.ndarray:
+    """Otsu-binarized copy of a crop (dark ink on white), as 3 channels."""
+    grey = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(cv2.GaussianBlur(grey, (3, 3), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+
+
+def upscale(crop: np.ndarray, factor: float = UPSCALE) -> np.ndarray:
+    return cv2.resize(crop, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+
+
+def crop_variants(img: np.ndarray, box, padding: int) -> list:
+    """
+    The alternative readings tried for one low-confidence ROI: other
+    paddings, plus a binarized and an upscaled copy of the original crop.
+    """
+    crop = crop_roi(img, box, padding)
+    variants = [crop_roi(img, box, p) for p in ALT_PADDINGS if p != padding]
+    if crop.size:
+        variants += [binarize(crop), upscale(crop)]
+    return [v for v in variants if v.size]
+
+
+# --- 3. Second Pass ---
+def reocr_low_confidence(img: np.ndarray, rois: list, candidates: list, results: list, routes: list,
+                         padding: int, specs: list = None, min_confidence: float = MIN_CONFIDENCE,
+                         stats: dict = None) -> list:
+    """
+    Re-reads the candidate ROIs whose first reading is below min_confidence.
+    All variants of all such ROIs go to their engine in a single call (one
+    call per engine); the best-scoring reading replaces the first one.
+    specs carries each ROI's (allowlist, decoder) constraint to the engines.
+    Updates results in place and returns the indices that were re-read.
+    """
+    low = [i for i in candidates if results[i] is not None and results[i][1] < min_confidence]
+    if not low:
+        return []
+
+    # (roi index, variant crop), grouped by engine
+    by_engine = {}
+    for i in low:
+        for variant in crop_variants(img, rois[i], padding):
+            by_engine.setdefault(routes[i][0], []).append((i, variant))
+
+    readings = {i: [results[i]] for i in low}
+    for jobs in by_engine.values():
+        engine = routes[jobs[0][0]][1]
+        job_specs = [specs[i] for i, _ in jobs] if specs else None
+        for (i, _), reading in zip(jobs, engine([crop for _, crop in jobs], specs=job_specs)):
+            readings[i].append(reading)
+
+    if SECONDARY_ENGINE:
+        from ocr_engines import get_engine
+        secondary = get_engine(SECONDARY_ENGINE)
+        low_specs = [specs[i] for i in low] if specs else None
+        for i, reading in zip(low, secondary.recognize([crop_roi(img, rois[i], padding) for i in low],
+                                                       specs=low_specs)):
+            readings[i].append(reading)
+
+    improved = 0
+    for i in low:
+        best = max(readings[i], key=lambda r: r[1])
+        if best[1] > results[i][1]:
+            results[i] = best
+            improved += 1
+
+    if stats is not None:
+        stats["reocr_attempted"] = stats.get("reocr_attempted", 0) + len(low)
+        stats["reocr_improved"] = stats.get("reocr_improved", 0) + improved
+    return low
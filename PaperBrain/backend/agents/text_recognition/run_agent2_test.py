@@ -1,12 +1,13 @@
 import asyncio
-import base64
+import glob
 import json
 import os
 import sys
-import glob   # <-- NEW
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+from answer_types import load_answer_specs, specs_for_rois
+
 # Fix Windows console encoding to handle Unicode properly
 if sys.platform == 'win32':
     try:
@@ -18,6 +19,16 @@ if sys.platform == 'win32':
 # --- 1. CONFIGURE FOLDER PATHS ---
 AGENT1_OUTPUT_FOLDER = "../region_selector/agent1_output"
 FINAL_EVALUATIONS_FOLDER = "./Outputs"
+# Kept outside Outputs/ because the evaluator grades every JSON file in there
+OCR_SUMMARY_FILE = "./ocr_summary.json"
+
+# Number of OCR worker processes. 1 keeps the single MCP server session;
+# more than 1 runs sheets in parallel through the shared-memory OCR pool.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+
+# MCP path: sheets per read_text_in_sheets call, and calls in flight at once
+OCR_SHEETS_PER_CALL = max(1, int(os.getenv("OCR_SHEETS_PER_CALL", "4")))
+OCR_CLIENT_CONCURRENCY = max(1, int(os.getenv("OCR_CLIENT_CONCURRENCY", "2")))
 
 # Create final output folder if it doesn't exist
 os.makedirs(FINAL_EVALUATIONS_FOLDER, exist_ok=True)
@@ -29,86 +40,225 @@ agent_2_server = StdioServerParameters(
     args=["ocr_server.py"] 
 )
 
+def find_jobs():
+    """Returns Agent 1's data files, or an empty list after printing why."""
+    json_files = glob.glob(os.path.join(AGENT1_OUTPUT_FOLDER, "*.json"))
+    if not json_files:
+        print(f"Error: No data files found in '{AGENT1_OUTPUT_FOLDER}'.")
+        print("Please run the Agent 1 (ipynb) script first.")
+    return json_files
+
+def save_final_output(job_file_path, answers_dict, confidences=None):
+    """Writes one sheet's answers in the format the evaluator expects."""
+    # Placeholder student info
+    student_info = {
+        "name": "STUDENT_NAME_HERE",
+        "roll_no": "ROLL_NO_HERE"
+    }
+    
+    final_output = {
+        "student_info": student_info,
+        "answers": answers_dict
+    }
+    # Per-question OCR confidence, for reviewing doubtful readings
+    if confidences:
+        final_output["ocr_confidences"] = confidences
+
+    base_name = os.path.basename(job_file_path)
+    file_name_only = os.path.splitext(base_name)[0].replace('_data', '')
+    output_filename = f"{FINAL_EVALUATIONS_FOLDER}/{file_name_only}_evaluation.json"
+    
+    with open(output_filename, 'w') as f:
+        json.dump(final_output, f, indent=4)
+    
+    print(f"Success! Saved final evaluation to {output_filename}")
+
+def merge_stats(totals, stats):
+    """Adds one sheet's OCR counters (cache hits, misses, ...) to the run totals."""
+    for key, value in stats.items():
+        totals[key] = totals.get(key, 0) + value
+
+def save_summary(totals, sheets):
+    """Writes the run-level OCR summary that the controller reports."""
+    summary = dict(totals)
+    summary["sheets"] = sheets
+    with open(OCR_SUMMARY_FILE, 'w') as f:
+        json.dump(summary, f, indent=4)
+    print(f"OCR summary: {json.dumps(summary)}")
+
+def build_sheet(job_file_path, answer_specs):
+    """Loads one Agent 1 data file as a read_text_in_sheets entry, or None if incomplete."""
+    with open(job_file_path, 'r') as f:
+        data = json.load(f)
+
+    image_base64 = data.get("image_base64")
+    rois = data.get("rois")
+    if not image_base64 or not rois:
+        print(f"Skipping job {job_file_path}, data file is missing 'image_base64' or 'rois'.")
+        return None
+
+    sheet = {"id": job_file_path, "image_base64": image_base64, "rois": rois}
+    if data.get("template_path"):
+        sheet["template_path"] = data["template_path"]
+    if answer_specs:
+        sheet["answer_specs"] = specs_for_rois(len(rois), answer_specs)
+    # Per-exam OCR engine, when the job names one (see ocr_engines.py)
+    if data.get("ocr_engine"):
+        sheet["engine"] = data["ocr_engine"]
+    return sheet
+
 async def run_batch_ocr():
     """
-    Finds all data files from Agent 1, launches Agent 2,
-    and calls the tool for each file.
+    Finds all data files from Agent 1, launches Agent 2, and sends the
+    sheets in chunks of OCR_SHEETS_PER_CALL, with up to OCR_CLIENT_CONCURRENCY
+    calls in flight so the server can batch crops across sheets.
     """
     
     # --- 2. FIND ALL JOBS FROM AGENT 1 ---
-    json_files = glob.glob(os.path.join(AGENT1_OUTPUT_FOLDER, "*.json"))
+    json_files = find_jobs()
     if not json_files:
-        print(f"Error: No data files found in '{AGENT1_OUTPUT_FOLDER}'.")
-        print("Please run the Agent 1 (ipynb) script first.")
         return
         
     print(f"Found {len(json_files)} answer sheets to evaluate.")
+
+    # Per-question answer types (MCQ / numeric / text) from the reference answers
+    answer_specs = load_answer_specs()
+    sheets = [sheet for sheet in (build_sheet(path, answer_specs) for path in json_files) if sheet]
+    chunks = [sheets[i:i + OCR_SHEETS_PER_CALL] for i in range(0, len(sheets), OCR_SHEETS_PER_CALL)]
     
     # --- 3. LAUNCH AGENT 2 (ONCE) ---
     print(f"\n--- Client: Launching server 'python3 ocr_server.py' ---")
     
+    totals = {}
+    saved = 0
     async with stdio_client(agent_2_server) as (read, write):
         async with ClientSession(read, write) as session:
             await session.initialize()
             print("--- Client: Server initialized. Starting batch... ---")
-            
-            # --- 4. LOOP THROUGH EACH JOB ---
-            for job_file_path in json_files:
-                print(f"\n--- Processing job: {job_file_path} ---")
-                
-                # --- 4a. Load data from Agent 1's file ---
-                with open(job_file_path, 'r') as f:
-                    data = json.load(f)
-                
-                image_base64_to_test = data.get("image_base64")
-                rois_to_test = data.get("rois")
-                
-                if not image_base64_to_test or not rois_to_test:
-                    print(f"Skipping job, data file is missing 'image_base64' or 'rois'.")
-                    continue
-                
-                # --- 4b. Call the tool ---
-                print(f"Calling tool 'read_text_in_rois' with {len(rois_to_test)} ROIs...")
-                result = await session.call_tool(
-                    "read_text_in_rois",
-                    {
-                        "image_base64": image_base64_to_test,
-                        "rois": rois_to_test
-                    }
-                )
-                
-                # --- 4c. Process the result ---
-                final_json_text = None
+
+            in_flight = asyncio.Semaphore(OCR_CLIENT_CONCURRENCY)
+
+            async def on_progress(progress, total, message):
+                print(f"  [{int(progress)}/{int(total)}] {message}")
+
+            async def send(chunk):
+                async with in_flight:
+                    print(f"Calling tool 'read_text_in_sheets' with {len(chunk)} sheets...")
+                    return await session.call_tool("read_text_in_sheets", {"sheets": chunk},
+                                                   progress_callback=on_progress)
+
+            # --- 4. SEND ALL CHUNKS, SAVING EACH AS IT COMES BACK ---
+            for next_result in asyncio.as_completed([send(chunk) for chunk in chunks]):
+                result = await next_result
                 for item in result.content:
-                    if item.type == 'text' and item.text.startswith('{'):
-                        final_json_text = item.text
-                
-                if final_json_text:
-                    answers_dict = json.loads(final_json_text)
-
-                    # Placeholder student info
-                    student_info = {
-                        "name": "STUDENT_NAME_HERE",
-                        "roll_no": "ROLL_NO_HERE"
-                    }
-                    
-                    final_output = {
-                        "student_info": student_info,
-                        "answers": answers_dict
-                    }
-
-                    # --- 4d. Save the final JSON ---
-                    base_name = os.path.basename(job_file_path)
-                    file_name_only = os.path.splitext(base_name)[0].replace('_data', '')
-                    output_filename = f"{FINAL_EVALUATIONS_FOLDER}/{file_name_only}_evaluation.json"
-                    
-                    with open(output_filename, 'w') as f:
-                        json.dump(final_output, f, indent=4)
-                    
-                    print(f"Success! Saved final evaluation to {output_filename}")
-                    
-                else:
-                    print(f"Error: No JSON output found from server for this job.")
+                    if item.type != 'text' or not item.text.startswith('{'):
+                        print(f"Error: {getattr(item, 'text', item)}")
+                        continue
+                    for sheet in json.loads(item.text)["sheets"]:
+                        if "error" in sheet:
+                            print(f"Error: Sheet {sheet['id']} failed: {sheet['error']}")
+                            continue
+                        save_final_output(sheet["id"], sheet["answers"], sheet["confidences"])
+                        merge_stats(totals, sheet["stats"])
+                        saved += 1
+
+            # --- 5. Report recognizer batching (batch sizes / queue waits) ---
+            stats = await session.call_tool("get_batching_stats", {})
+            for item in stats.content:
+                if item.type == 'text':
+                    print(f"Recognizer batching stats: {item.text}")
+
+            stats = await session.call_tool("get_engine_stats", {})
+            for item in stats.content:
+                if item.type == 'text':
+                    print(f"OCR engine latency: {item.text}")
+
+    save_summary(totals, saved)
+
+def run_pool_ocr():
+    """
+    Runs every sheet through a pool of OCR worker processes.
+    Pages are decoded here and shared with the workers via shared memory.
+    """
+    from ocr_pool import OCRPool
+    import recognizer as ocr
+
+    json_files = find_jobs()
+    if not json_files:
+        return
+
+    print(f"Found {len(json_files)} answer sheets to evaluate.")
+
+    answer_specs = load_answer_specs()
+
+    jobs = []
+    pages = []
+    for job_file_path in json_files:
+        sheet = build_sheet(job_file_path, answer_specs)
+        if not sheet:
+            continue
+
+        prefix = os.path.splitext(os.path.basename(job_file_path))[0].replace('_data', '') + "_"
+        jobs.append(job_file_path)
+        pages.append((ocr.decode_image(sheet["image_base64"]), sheet["rois"], prefix,
+                      sheet.get("template_path"), sheet.get("answer_specs"), sheet.get("engine")))
+
+    print(f"\n--- Client: Starting OCR pool with {OCR_WORKERS} workers ---")
+    with OCRPool(workers=OCR_WORKERS) as pool:
+        results = pool.recognize_pages(pages)
+
+    totals = {}
+    for job_file_path, (recognized_list, confidence_list, stats) in zip(jobs, results):
+        answers_dict = {f"Q{i+1}": answer for i, answer in enumerate(recognized_list)}
+        confidences = {f"Q{i+1}": c for i, c in enumerate(confidence_list)}
+        save_final_output(job_file_path, answers_dict, confidences)
+        merge_stats(totals, stats)
+
+    save_summary(totals, len(jobs))
+
+def run_local_ocr():
+    """
+    Recognizes every sheet in this process with its already-loaded reader.
+    The controller uses this when the web server preloaded the models, so
+    no OCR server has to start and load its own copy of the weights.
+    """
+    from ocr_cache import OCRCache
+    from ocr_pool import recognize_job
+    import recognizer as ocr
+
+    json_files = find_jobs()
+    if not json_files:
+        return
+
+    print(f"Found {len(json_files)} answer sheets to evaluate (in-process OCR).")
+
+    answer_specs = load_answer_specs()
+    cache = OCRCache() if os.getenv("OCR_CACHE", "1") != "0" else None
+
+    totals = {}
+    saved = 0
+    for job_file_path in json_files:
+        sheet = build_sheet(job_file_path, answer_specs)
+        if not sheet:
+            continue
+
+        prefix = os.path.splitext(os.path.basename(job_file_path))[0].replace('_data', '') + "_"
+        recognized_list, confidence_list, stats = recognize_job(
+            ocr.decode_image(sheet["image_base64"]), sheet["rois"], prefix,
+            sheet.get("template_path"), sheet.get("answer_specs"), cache, sheet.get("engine"))
+
+        answers_dict = {f"Q{i+1}": answer for i, answer in enumerate(recognized_list)}
+        confidences = {f"Q{i+1}": c for i, c in enumerate(confidence_list)}
+        save_final_output(job_file_path, answers_dict, confidences)
+        merge_stats(totals, stats)
+        saved += 1
+
+    if cache is not None:
+        cache.close()
+    save_summary(totals, saved)
 
 if __name__ == "__main__":
-    asyncio.run(run_batch_ocr())
\ No newline at end of file
+    if OCR_WORKERS > 1:
+        run_pool_ocr()
+    else:
+        asyncio.run(run_batch_ocr())
\ No newline at end of file
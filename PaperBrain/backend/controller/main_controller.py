@@ -1,16 +1,42 @@
 import os
+import io
 import json
+import importlib
+import importlib.util
 import shutil
 import subprocess
 import sys
+import threading
+import traceback
 import cv2
 import base64
+from contextlib import redirect_stderr, redirect_stdout
 from typing import Dict, Any, List
 
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 AGENTS_ROOT = os.path.join(PROJECT_ROOT, "agents")
 
+# One evaluator Grader per process, so Gemini setup and the grade cache survive across runs
+_grader = None
+_grader_lock = threading.Lock()
+
+
+def get_grader(evaluator_dir: str = os.path.join(AGENTS_ROOT, "evaluator")):
+    """Imports the evaluator's main.py (no side effects at import) and returns a shared Grader."""
+    global _grader
+    with _grader_lock:
+        if _grader is None:
+            # main.py imports its sibling modules by name
+            if evaluator_dir not in sys.path:
+                sys.path.insert(0, evaluator_dir)
+            spec = importlib.util.spec_from_file_location("evaluator_main", os.path.join(evaluator_dir, "main.py"))
+            evaluator_main = importlib.util.module_from_spec(spec)
+            sys.modules["evaluator_main"] = evaluator_main
+            spec.loader.exec_module(evaluator_main)
+            _grader = evaluator_main.Grader()
+        return _grader
+
 
 class PipelineController:
     """Coordinates the agents in the required order without modifying agent code."""
@@ -37,6 +63,9 @@ class PipelineController:
         # Student info mapping file (maps answer sheet filenames to student info)
         self.student_info_file = os.path.join(self.text_recognition_dir, "Outputs", "student_info_mapping.json")
 
+        # OCR results of this run ({"student_info", "answers", "id"}), graded in memory by the evaluator
+        self.submissions = []
+
         # Ensure expected directories exist
         os.makedirs(self.evaluator_related_docs_dir, exist_ok=True)
         os.makedirs(os.path.join(self.evaluator_dir, "temp"), exist_ok=True)
@@ -223,6 +252,30 @@ class PipelineController:
     # -------------------------------------------------------------------------
     # TEXT RECOGNITION
     # -------------------------------------------------------------------------
+    def _models_preloaded(self) -> bool:
+        """True when the web server already loaded the OCR recognizer in this process."""
+        model_warmup = sys.modules.get("model_warmup")
+        return model_warmup is not None and model_warmup.recognizer_ready()
+
+    def _run_text_recognition_in_process(self) -> subprocess.CompletedProcess:
+        """
+        Runs run_agent2_test.run_local_ocr() with the preloaded recognizer instead
+        of starting a new interpreter that would load the weights again.
+        Expects the cwd to be the text recognition folder. Returns a
+        CompletedProcess so callers handle both paths the same way.
+        """
+        if self.text_recognition_dir not in sys.path:
+            sys.path.insert(0, self.text_recognition_dir)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        returncode = 0
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                importlib.import_module("run_agent2_test").run_local_ocr()
+            except Exception:
+                traceback.print_exc()
+                returncode = 1
+        return subprocess.CompletedProcess(["run_local_ocr"], returncode, stdout.getvalue(), stderr.getvalue())
+
     def run_text_recognition(self) -> Dict[str, Any]:
         print("\n📝 Step 3: Running Text Recognition...")
         try:
@@ -244,12 +297,15 @@ class PipelineController:
             os.chdir(self.text_recognition_dir)
             
             try:
-                result = subprocess.run(
-                    [self._python_executable(), "run_agent2_test.py"],
-                    capture_output=True,
-                    text=True,
-                    timeout=120
-                )
+                if self._models_preloaded():
+                    result = self._run_text_recognition_in_process()
+                else:
+                    result = subprocess.run(
+                        [self._python_executable(), "run_agent2_test.py"],
+                        capture_output=True,
+                        text=True,
+                        timeout=120
+                    )
                 
                 os.chdir(original_cwd)
                 
@@ -296,6 +352,7 @@ class PipelineController:
                 
                 # Process all OCR output files and update student_info in each
                 processed_count = 0
+                self.submissions = []
                 for output_file in output_files:
                     output_path = os.path.join(outputs_dir, output_file)
                     
@@ -364,6 +421,7 @@ class PipelineController:
                     # Save updated output
                     with open(output_path, "w", encoding="utf-8") as f:
                         json.dump(ocr_output, f, indent=2, ensure_ascii=False)
+                    self.submissions.append({**ocr_output, "id": output_file})
                     
                     processed_count += 1
                     print(f"  ✓ Updated {output_file} with student info: {student_info['name']} ({student_info['roll_no']})")
@@ -374,11 +432,23 @@ class PipelineController:
                 print(f"✅ Text Recognition completed")
                 print(f"  Processed {processed_count} answer sheet(s)")
                 
+                # OCR run summary (cache hits/misses, ...) written by run_agent2_test.py
+                ocr_summary = {}
+                summary_path = os.path.join(self.text_recognition_dir, "ocr_summary.json")
+                if os.path.isfile(summary_path):
+                    try:
+                        with open(summary_path, "r", encoding="utf-8") as f:
+                            ocr_summary = json.load(f)
+                        print(f"  OCR summary: {ocr_summary}")
+                    except Exception as e:
+                        print(f"  ⚠️  Could not read OCR summary: {e}")
+                
                 return {
                     "status": "completed",
                     "message": f"OCR done successfully. Processed {processed_count} answer sheet(s).",
                     "processed_count": processed_count,
-                    "output_files": output_files
+                    "output_files": output_files,
+                    "summary": ocr_summary
                 }
                 
             except subprocess.TimeoutExpired:
@@ -401,6 +471,37 @@ class PipelineController:
     # -------------------------------------------------------------------------
     # EVALUATOR
     # -------------------------------------------------------------------------
+    def _run_evaluator_in_process(self):
+        """
+        Grades the waiting submissions with the shared Grader in this process,
+        without an interpreter start-up or a time limit. The OCR results from
+        run_text_recognition are graded as they are; without them the Grader
+        reads the Outputs folder. Returns a CompletedProcess (stdout/stderr
+        captured) and the Grader's structured result ({"students", "ungraded",
+        "stats"}, or None if it failed).
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        returncode = 0
+        grading = None
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                grader = get_grader(self.evaluator_dir)
+                if self.submissions:
+                    grading = grader.save_run(grader.grade_submissions(self.submissions))
+                    graded = {student["id"] for student in grading["students"]}
+                    for output_file in graded:
+                        # Graded sheets must not be picked up again by the next run
+                        output_path = os.path.join(self.text_recognition_outputs_dir, output_file)
+                        if os.path.isfile(output_path):
+                            os.remove(output_path)
+                    self.submissions = [entry for entry in self.submissions if entry["id"] not in graded]
+                else:
+                    grading = grader.process_all_students()
+            except Exception:
+                traceback.print_exc()
+                returncode = 1
+        return subprocess.CompletedProcess(["Grader.grade_submissions"], returncode, stdout.getvalue(), stderr.getvalue()), grading
+
     def run_evaluator(self) -> Dict[str, Any]:
         print("\n📊 Step 4: Running Evaluator...")
         
@@ -439,12 +540,7 @@ class PipelineController:
             original_cwd = os.getcwd()
             os.chdir(self.evaluator_dir)
 
-            result = subprocess.run(
-                [self._python_executable(), "main.py"],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
+            result, grading = self._run_evaluator_in_process()
 
             os.chdir(original_cwd)
             ran_script = result.returncode == 0
@@ -493,11 +589,8 @@ class PipelineController:
                 "stderr": result.stderr,
                 "current_student": current_student,
                 "results": results_data,
+                "grading": grading,
             }
-        except subprocess.TimeoutExpired:
-            os.chdir(original_cwd)
-            print("❌ Evaluator timed out")
-            return {"status": "error", "message": "Evaluator timed out."}
         except Exception as e:
             os.chdir(original_cwd)
             print(f"❌ Evaluator error: {e}")
@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for the PaperBrain API.
+
+PRELOAD_MODELS=1 imports server.py in the master (preload_app), which warms
+the models once (see model_warmup.py); workers then fork with the weights
+already in memory instead of each loading its own copy.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("PRELOAD_MODELS", "0") == "1"
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers fork.
+    # Freezing moves everything allocated so far out of the GC's reach, so
+    # collections in the workers do not touch (and copy) the shared pages.
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Split the cores between workers so their torch thread pools do not oversubscribe
+    import sys
+
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
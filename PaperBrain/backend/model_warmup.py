@@ -0,0 +1,105 @@
+"""
+Model warm-up for the web server.
+
+With PRELOAD_MODELS=1, server.py calls warm_up() at import time. Under
+gunicorn with preload_app (see gunicorn.conf.py) that import happens once in
+the master, so every forked worker starts with the heavy modules imported
+and the OCR recognizer loaded, sharing those pages copy-on-write.
+status() is reported by /api/health.
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+TEXT_RECOGNITION_DIR = os.path.join(BASE_DIR, "agents", "text_recognition")
+
+# Imported up front so workers never pay for them on a request
+HEAVY_MODULES = ("numpy", "cv2", "torch", "easyocr", "google.generativeai")
+
+_lock = threading.Lock()
+_state = {
+    "status": "cold",          # cold -> warming -> ready | error
+    "preloaded_pid": None,     # process that ran warm_up (the gunicorn master when preloading)
+    "modules": {},             # module -> import seconds (or an error string)
+    "recognizer": {"loaded": False, "seconds": None, "mode": None, "bundle": None},
+    "glyph_classifier": {"loaded": False, "seconds": None},
+    "total_seconds": None,
+    "error": None,
+}
+
+
+def warm_up(load_recognizer: bool = True) -> dict:
+    """
+    Imports the heavy modules and loads the OCR recognizer and glyph
+    classifier in this process. Safe to call more than once.
+    """
+    with _lock:
+        if _state["status"] in ("warming", "ready"):
+            return status()
+        _state["status"] = "warming"
+        _state["preloaded_pid"] = os.getpid()
+
+    start = time.perf_counter()
+    for name in HEAVY_MODULES:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            _state["modules"][name] = round(time.perf_counter() - t0, 3)
+        except ImportError as e:
+            _state["modules"][name] = f"not installed: {e}"
+
+    if load_recognizer:
+        try:
+            _load_ocr_models()
+        except Exception as e:
+            _state["status"] = "error"
+            _state["error"] = f"OCR warm-up failed: {e}"
+            print(f"⚠️  {_state['error']}")
+            return status()
+
+    _state["total_seconds"] = round(time.perf_counter() - start, 3)
+    _state["status"] = "ready"
+    print(f"🔥 Models warmed up in {_state['total_seconds']}s (pid {os.getpid()})")
+    return status()
+
+
+def _load_ocr_models() -> None:
+    # The OCR modules import each other by plain name and use paths relative
+    # to their own folder, exactly as when the controller runs them there.
+    if TEXT_RECOGNITION_DIR not in sys.path:
+        sys.path.insert(0, TEXT_RECOGNITION_DIR)
+    original_cwd = os.getcwd()
+    os.chdir(TEXT_RECOGNITION_DIR)
+    try:
+        recognizer = importlib.import_module("recognizer")
+        t0 = time.perf_counter()
+        recognizer.load_reader()
+        _state["recognizer"] = {"loaded": True, "seconds": round(time.perf_counter() - t0, 3),
+                                "mode": recognizer.RECOGNIZER_MODE,
+                                "bundle": importlib.import_module("model_bundle").bundle_dir()}
+
+        if os.getenv("OCR_GLYPH", "1") != "0":
+            glyph_classifier = importlib.import_module("glyph_classifier")
+            t0 = time.perf_counter()
+            glyph_classifier.load_classifier(recognizer.DEFAULT_ALLOWLIST)
+            _state["glyph_classifier"] = {"loaded": True, "seconds": round(time.perf_counter() - t0, 3)}
+    finally:
+        os.chdir(original_cwd)
+
+
+def recognizer_ready() -> bool:
+    """True when this process already holds a loaded OCR recognizer."""
+    return _state["recognizer"]["loaded"]
+
+
+def status() -> dict:
+    snapshot = {key: (dict(value) if isinstance(value, dict) else value) for key, value in _state.items()}
+    snapshot["pid"] = os.getpid()
+    # A worker forked from a preloading master inherits the warm models
+    snapshot["inherited_from_master"] = (
+        snapshot["preloaded_pid"] is not None and snapshot["preloaded_pid"] != os.getpid()
+    )
+    return snapshot
@@ -18,6 +18,12 @@ except ImportError as e:
     raise
 
 
+# Warm the models at import time (once in the gunicorn master with preload_app)
+import model_warmup
+if os.getenv("PRELOAD_MODELS", "0") == "1":
+    model_warmup.warm_up()
+
+
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -70,9 +76,13 @@ def health() -> Any:
     """Health check endpoint"""
     try:
         controller = PipelineController()
+        models = model_warmup.status()
         return jsonify({
             "status": "ok",
             "message": "Server is healthy",
+            # Ready once the preloaded models are warm (always ready without preloading)
+            "ready": models["status"] == "ready" or os.getenv("PRELOAD_MODELS", "0") != "1",
+            "models": models,
             "paths": {
                 "preprocessor": os.path.exists(controller.preprocessor_dir),
                 "region_selector": os.path.exists(controller.region_selector_dir),
@@ -452,7 +462,47 @@ def evaluation_results() -> Any:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/results/all-students", methods=["GET"]) 
+@app.route("/api/results/usage", methods=["GET"])
+def usage_results() -> Any:
+    """Get model latency, token and cost accounting per run, question and student (?calls=N adds the last N requests)"""
+    try:
+        controller = PipelineController()
+        results_dir = os.path.join(controller.evaluator_dir, "results")
+        results_path = os.path.join(results_dir, "evaluation_results.json")
+        if not os.path.isfile(results_path):
+            return jsonify({"error": "evaluation_results.json not found"}), 404
+
+        with open(results_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        last_usage = data.get("last_run", {}).get("usage", {})
+        response = {
+            "last_run": last_usage.get("run"),
+            "per_question": last_usage.get("per_question", {}),
+            "slowest": last_usage.get("slowest", []),
+            "runs": data.get("runs", []),
+            "students": [
+                {
+                    "name": student.get("student_info", {}).get("name", ""),
+                    "roll_no": student.get("student_info", {}).get("roll_no", ""),
+                    "usage": student["usage"],
+                }
+                for student in data.get("students", []) if "usage" in student
+            ],
+        }
+
+        calls_limit = request.args.get("calls", default=0, type=int)
+        calls_path = os.path.join(results_dir, "llm_calls.jsonl")
+        if calls_limit > 0 and os.path.isfile(calls_path):
+            with open(calls_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()[-calls_limit:]
+            response["calls"] = [json.loads(line) for line in lines if line.strip()]
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/results/all-students", methods=["GET"])
 def all_students_results() -> Any:
     """Get all students' results with processed data for frontend"""
     try:
@@ -610,16 +660,23 @@ def update_reference_answers() -> Any:
         updated_count = 0
         for qno, answer_data in answers.items():
             # Format: { "Q1": { "answer": "c", "marks": 2 } }
+            # Grading settings ("strategy", "tolerance", "units", ...) are kept unless resent
             if isinstance(answer_data, dict):
+                entry = {key: value for key, value in existing_refs.get(qno, {}).items()
+                         if key not in ("question", "answer", "marks")}
+                entry.update({key: value for key, value in answer_data.items()
+                              if key not in ("question", "answer", "marks")})
                 existing_refs[qno] = {
                     "question": "",
                     "answer": answer_data.get("answer", ""),
-                    "marks": answer_data.get("marks", 1)
+                    "marks": answer_data.get("marks", 1),
+                    **entry
                 }
                 updated_count += 1
             elif isinstance(answer_data, str):
                 # Simple format: just the answer string, use default marks
                 existing_refs[qno] = {
+                    **existing_refs.get(qno, {}),
                     "question": "",
                     "answer": answer_data,
                     "marks": existing_refs.get(qno, {}).get("marks", 1)  # Keep existing marks if available
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The agents are script folders whose modules import each other by name
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for agent in ("evaluator", "text_recognition"):
+    path = os.path.join(BACKEND_DIR, "agents", agent)
+    if path not in sys.path:
+        sys.path.insert(0, path)
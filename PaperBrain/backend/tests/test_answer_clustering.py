@@ -0,0 +1,41 @@
+import pytest
+
+from answer_clustering import cluster_answers
+
+
+def clusters_of(answers):
+    return sorted(sorted(answers[i] for i in cluster) for cluster in cluster_answers(answers))
+
+
+@pytest.mark.parametrize("a, b", [
+    ("velocity increases", "velocity decreases"),
+    ("the reaction is exothermic", "the reaction is endothermic"),
+    ("hypothyroidism", "hyperthyroidism"),
+    ("sodium chloride", "sodium chlorate"),
+    ("fail", "fall"),
+    ("10 m", "lo m"),
+    ("vitamin b12", "vitamin b1"),
+])
+def test_different_answers_stay_apart(a, b):
+    assert len(cluster_answers([a, b])) == 2
+
+
+def test_case_and_punctuation_variants_cluster():
+    assert clusters_of(["Mitochondria.", "mitochondria", " MITOCHONDRIA "]) == [
+        [" MITOCHONDRIA ", "Mitochondria.", "mitochondria"]]
+
+
+def test_ocr_digit_slips_join_the_clean_answer():
+    answers = ["0xygen", "oxygen", "ce1l wa1l", "cell wall", "5odium", "sodium"]
+    assert clusters_of(answers) == [["0xygen", "oxygen"], ["5odium", "sodium"], ["ce1l wa1l", "cell wall"]]
+
+
+def test_representative_is_the_clean_variant():
+    answers = ["0xygen", "oxygen"]
+    (cluster,) = cluster_answers(answers, [5, 1])
+    assert answers[cluster[0]] == "oxygen"
+
+
+def test_ambiguous_slip_stays_alone():
+    # "fa1l" could be "fail" or "fall"
+    assert clusters_of(["fa1l", "fail", "fall"]) == [["fa1l"], ["fail"], ["fall"]]
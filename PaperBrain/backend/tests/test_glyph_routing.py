@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+import recognizer
+
+
+def page_with(chars):
+    """A white page with one large handwritten-style character per 100px ROI."""
+    page = np.full((120, 100 * len(chars), 3), 255, np.uint8)
+    for k, char in enumerate(chars):
+        cv2.putText(page, char, (100 * k + 25, 85), cv2.FONT_HERSHEY_SIMPLEX, 2.2, (20, 20, 20), 5, cv2.LINE_AA)
+    return page, [[100 * k + 10, 10, 80, 100] for k in range(len(chars))]
+
+
+def test_out_of_class_glyphs_go_to_the_engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine_calls = []
+
+    def engine(crops, specs=None):
+        engine_calls.extend(spec[0] for spec in specs)
+        return [("e", 0.97)]
+
+    # 'e' is an MCQ option the classifier has no class for (it would read it as 'c')
+    page, rois = page_with(["e"])
+    stats = {}
+    answers = recognizer.recognize_page(page, rois, engine=engine, stats=stats, reocr=False, skip_blank=False,
+                                        roi_specs=[("abcde", "single")])
+    assert answers == ["e"]
+    assert engine_calls == ["abcde"]
+    assert stats.get("glyph_accepted", 0) == 0
+
+
+def test_answer_type_glyphs_use_the_classifier(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def engine(crops, specs=None):
+        raise AssertionError(f"engine called for {specs}")
+
+    # The specs answer_types.py gives MCQ and numeric questions
+    page, rois = page_with(["b", "7"])
+    stats = {}
+    answers = recognizer.recognize_page(page, rois, engine=engine, stats=stats, reocr=False, skip_blank=False,
+                                        roi_specs=[("abcd", "single"), ("0123456789-", "greedy")])
+    assert answers == ["b", "7"]
+    assert stats["glyph_accepted"] == 2
+
+
+def test_engine_calls_count_invocations_not_rois(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def engine(crops, specs=None):
+        calls.append(len(crops))
+        return [("x", 0.97)] * len(crops)
+
+    page, rois = page_with(["e", "f", "g"])
+    stats = {}
+    recognizer.recognize_page(page, rois, engine=engine, stats=stats, reocr=False, skip_blank=False,
+                              use_glyph=False)
+    assert calls == [3]
+    assert stats["engine_calls"] == 1
+    assert stats["engine_rois"] == 3
@@ -0,0 +1,15 @@
+import time
+
+from grading_cache import GradingCache
+
+
+def test_memory_layer_honours_the_ttl(tmp_path, monkeypatch):
+    cache = GradingCache(str(tmp_path), ttl_days=1)
+    cache.put("k", 2, "ok")
+    assert cache.get("k") == (2, "ok", {})
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 2 * 86400)
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    cache.close()
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+vgg_model = pytest.importorskip("easyocr.model.vgg_model")
+
+import model_bundle
+import model_export
+import recognizer
+from benchmark_engines import label_specs
+from benchmark_recognizer import load_crops
+from preprocess import prepare_batch
+
+CROP_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "crops")
+TEXT_RECOGNITION_DIR = os.path.dirname(recognizer.__file__)
+# english_g2: 96 characters plus the CTC blank
+NUM_CLASS = 97
+
+
+def fixture_crops():
+    crops, labels = load_crops(CROP_DIR)
+    assert len(crops) == 9 and labels[:3] == ["0", "2024", "2"]
+    return crops
+
+
+def run(model, batch):
+    images = torch.from_numpy(batch)
+    text = torch.zeros(len(batch), int(batch.shape[3] / 10) + 1, dtype=torch.long)
+    with torch.no_grad():
+        return model(images, text)
+
+
+@pytest.mark.parametrize("pick, shape", [(slice(2, 3), (1, 1, 64, 128)), (slice(None), (9, 1, 64, 192))],
+                         ids=["one-narrow-crop", "all-crops"])
+def test_export_matches_eager_model(tmp_path, pick, shape):
+    # The export is weight-independent, so seeded random weights stand in for
+    # the downloaded english_g2 checkpoint
+    torch.manual_seed(0)
+    eager = model_export.quantize_recognizer(vgg_model.Model(1, 256, 256, NUM_CLASS).eval())
+    model_export.export_recognizer(eager, str(tmp_path / "recognizer.pt"))
+    exported = torch.jit.load(str(tmp_path / "recognizer.pt"))
+
+    batch = prepare_batch(fixture_crops()[pick])
+    assert batch.shape == shape
+    expected, actual = run(eager, batch), run(exported, batch)
+
+    assert actual.shape == expected.shape
+    assert torch.allclose(actual, expected, atol=1e-4)
+    assert np.array_equal(actual.argmax(2).numpy(), expected.argmax(2).numpy())
+
+
+
+def weights_available() -> bool:
+    bundle = os.path.join(TEXT_RECOGNITION_DIR, model_bundle.bundle_dir(), model_bundle.MANIFEST_NAME)
+    stock = os.path.expanduser(os.path.join("~", ".EasyOCR", "model", f"{model_bundle.RECOGNITION_MODEL}.pth"))
+    return os.path.isfile(bundle) or os.path.isfile(stock)
+
+
+@pytest.mark.skipif(not weights_available(), reason="needs the english_g2 weights (python model_bundle.py pack)")
+@pytest.mark.parametrize("mode", ["quantized", "torchscript"])
+def test_mode_keeps_the_stock_model_accuracy(monkeypatch, mode):
+    monkeypatch.chdir(TEXT_RECOGNITION_DIR)
+    crops, labels = load_crops(CROP_DIR)
+    specs = label_specs(labels)
+
+    def answers(reader):
+        return [text.lower().strip() for text, _ in recognizer.recognize_crops(crops, reader=reader, specs=specs)]
+
+    def correct(texts):
+        return sum(text == label for text, label in zip(texts, labels))
+
+    stock = answers(recognizer.build_reader("float"))
+    tested = answers(recognizer.build_reader(mode))
+
+    # At most one crop may read differently from the stock fp32 model
+    assert sum(a != b for a, b in zip(tested, stock)) <= 1
+    assert correct(tested) >= correct(stock) - 1
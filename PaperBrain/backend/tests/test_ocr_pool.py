@@ -0,0 +1,16 @@
+import numpy as np
+
+import ocr_pool
+
+
+def test_recognize_job_uses_the_exam_engine(monkeypatch):
+    seen = {}
+
+    def recognize_page(page, rois, roi_engines=None, **kwargs):
+        seen["engines"] = [name for name, _ in roi_engines]
+        return ["" for _ in rois]
+
+    monkeypatch.setattr(ocr_pool.ocr, "recognize_page", recognize_page)
+    page = np.full((50, 50, 3), 255, np.uint8)
+    ocr_pool.recognize_job(page, [[0, 0, 10, 10], [10, 10, 10, 10]], engine="tesseract-char")
+    assert seen["engines"] == [ocr_pool.ocr_engines.get_engine("tesseract-char").cache_name] * 2
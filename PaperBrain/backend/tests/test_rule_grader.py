@@ -0,0 +1,33 @@
+from rule_grader import grade_with_rules, parse_number, question_strategy
+
+
+def test_formula_references_are_not_numeric():
+    for reference in ("H2O", "CO2", "C6H12O6", "B12", "2H2O", "3 4"):
+        assert question_strategy({"answer": reference}) == "llm", reference
+    assert grade_with_rules("CO2", {"answer": "H2O", "marks": 2}) is None
+
+
+def test_numbers_with_units_after_them():
+    assert parse_number("12.5 cm") == 12.5
+    assert parse_number("1,200 kg") == 1200
+    assert parse_number("45%") == 45
+    assert parse_number("cm 12") is None
+    assert parse_number("h2o") is None
+    assert question_strategy({"answer": "9.8 m/s^2"}) == "numeric"
+    assert question_strategy({"answer": "42"}) == "numeric"
+    # Unknown unit words only count when the question lists them
+    assert question_strategy({"answer": "3 apples"}) == "llm"
+    assert question_strategy({"answer": "3 apples", "units": ["apples"]}) == "numeric"
+
+
+def test_numeric_grading():
+    ref = {"answer": "42", "marks": 2, "tolerance": 0.5}
+    assert grade_with_rules("42.4", ref)[0] == 2
+    assert grade_with_rules("43", ref)[0] == 0
+    assert grade_with_rules("forty two", ref) is None
+
+
+def test_mcq_grading():
+    ref = {"answer": "c", "marks": 1}
+    assert grade_with_rules("(C)", ref)[0] == 1
+    assert grade_with_rules("b", ref)[0] == 0
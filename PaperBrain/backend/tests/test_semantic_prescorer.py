@@ -0,0 +1,35 @@
+from semantic_prescorer import PreScorer
+
+
+def item(qno, answer, n=1):
+    return {"id": f"s{n}:{qno}", "student": f"s{n}", "qno": qno, "answer": answer, "max_marks": 2}
+
+
+def test_uncalibrated_questions_go_to_the_model():
+    references = {"Q1": {"answer": "water", "marks": 2}, "Q2": {"answer": "deoxyribonucleic acid", "marks": 2},
+                  "Q3": {"answer": "the mitochondria", "marks": 2}}
+    items = [item("Q1", "H2O"), item("Q2", "DNA"), item("Q3", "powerhouse of cell"), item("Q1", "water", 2)]
+    prescorer = PreScorer(references, {}, items)
+    assert all(prescorer.grade(i) is None for i in items)
+    assert prescorer.thresholds["Q1"]["source"] == "none"
+
+
+def test_thresholds_set_per_question():
+    references = {"Q1": {"answer": "the mitochondria", "marks": 2, "prescore_high": 0.9}}
+    items = [item("Q1", "The mitochondria."), item("Q1", "powerhouse of cell", 2)]
+    prescorer = PreScorer(references, {}, items)
+    assert prescorer.grade(items[0])[0] == 2
+    # No low band was set, so a dissimilar answer still goes to the model
+    assert prescorer.grade(items[1]) is None
+
+
+def test_calibrated_bands():
+    right = ["photosynthesis converts light to chemical energy", "photosynthesis converts light into chemical energy",
+             "photosynthesis turns light to chemical energy", "photosynthesis converts light energy to chemical energy"] * 3
+    wrong = ["mitosis", "the cell wall", "osmosis moves water", "gravity"] * 3
+    past = {"Q1": [(a, 1.0) for a in right] + [(a, 0.0) for a in wrong]}
+    references = {"Q1": {"answer": "Photosynthesis converts light to chemical energy", "marks": 2}}
+    items = [item("Q1", "Photosynthesis converts light to chemical energy!"), item("Q1", "plants use sunlight", 2)]
+    prescorer = PreScorer(references, past, items)
+    assert prescorer.grade(items[0])[0] == 2
+    assert prescorer.thresholds["Q1"]["source"] == "calibrated"
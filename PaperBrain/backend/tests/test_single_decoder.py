@@ -0,0 +1,50 @@
+import numpy as np
+import torch
+
+import recognizer
+
+
+class FakeReader:
+    """A recognizer returning fixed per-frame logits over blank + 'abcd'."""
+
+    device = "cpu"
+    character = "abcd"
+    converter = None
+
+    def __init__(self, frames):
+        self.logits = torch.tensor(np.log(np.asarray(frames, np.float32) + 1e-9))
+
+    def recognizer(self, images, text):
+        return self.logits.expand(len(images), *self.logits.shape)
+
+
+def read(frames):
+    batch = np.zeros((1, 1, 64, 64), np.float32)
+    return recognizer.predict_batch(FakeReader(frames), batch, [("abcd", "single")])[0]
+
+
+def test_blank_box_reads_empty():
+    # Every frame is most likely the CTC blank (e.g. only a box border was inked)
+    assert read([[0.9, 0.04, 0.03, 0.02, 0.01]] * 4) == ("", 0.0)
+
+
+def test_unsure_single_character_reads_empty():
+    assert read([[0.3, 0.35, 0.35, 0.0, 0.0]] * 4) == ("", 0.0)
+
+
+def test_clear_option_is_read():
+    text, confidence = read([[0.9, 0.02, 0.03, 0.03, 0.02], [0.05, 0.01, 0.9, 0.02, 0.02]])
+    assert text == "b" and confidence > 0.8
+
+
+def test_forward_passes_are_counted_per_model_call():
+    crops = [np.full((30, 30), 200, np.uint8)] * 3
+    stats = {}
+    confident = FakeReader([[0.05, 0.01, 0.9, 0.02, 0.02]] * 2)
+    recognizer.recognize_crops(crops, reader=confident, specs=[("abcd", "single")] * 3, stats=stats)
+    assert stats == {"forward_passes": 1}
+
+    # Unreadable crops get the low-contrast retry: a second pass for the whole batch
+    recognizer.recognize_crops(crops, reader=FakeReader([[0.9, 0.04, 0.03, 0.02, 0.01]] * 2),
+                               specs=[("abcd", "single")] * 3, stats=stats)
+    assert stats == {"forward_passes": 3}